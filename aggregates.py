@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Materialised player-season aggregates.
+
+One row per (PlayerName, season) with the season totals of the appearances
+table and the per-90 rates derived from them. Season Trends and the radar
+both read from this table instead of grouping the appearances on every
+rerun. Totals are additive, so appending appearances only touches the rows
+of the player-seasons they belong to.
+"""
+
+import numpy as np
+import pandas as pd
+
+import data_loader
+import timings
+
+KEYS = ["PlayerName", "season"]
+
+#aggregate column -> appearances column it sums
+SUMS = {
+    "Goals": "goals",
+    "Shots": "shots",
+    "xGoals": "xGoals",
+    "xGChain": "xGoalsChain",
+    "xGBuildup": "xGoalsBuildup",
+    "xAssists": "xAssists",
+    "Assists": "assists",
+    "KP": "keyPasses",
+    "Minutes": "time",
+}
+TOTALS = list(SUMS) + ["played"]
+
+#per-90 rate -> total it is derived from
+RATES = {
+    "Goals90": "Goals",
+    "Shots90": "Shots",
+    "xG90": "xGoals",
+    "xC90": "xGChain",
+    "xA90": "xAssists",
+    "xB90": "xGBuildup",
+}
+
+#radar axes, in drawing order
+RADAR_METRICS = ["Goals90", "Shots90", "xG90", "xC90", "xA90"]
+
+#player-seasons with fewer minutes are left out of population statistics
+#(similarity profiles, radar percentiles), so a few lucky games do not count
+MIN_MINUTES = 900
+
+
+def _totals(apps):
+    """Season totals of `apps`, indexed by (PlayerName, season)."""
+    grouped = apps.groupby(KEYS, observed=True, sort=False)
+    totals = grouped[list(SUMS.values())].sum()
+    totals.columns = list(SUMS)
+    totals["played"] = grouped.size()
+    #plain string player level so tables built from different frames align
+    totals = totals.reset_index()
+    totals["PlayerName"] = totals["PlayerName"].astype(str)
+    totals["season"] = totals["season"].astype("int64")
+    return totals.set_index(KEYS)
+
+
+def _rates(totals):
+    """90s played and per-90 rates of a frame of totals (NaN without minutes)."""
+    t90s = totals["Minutes"].to_numpy(dtype=float) / 90
+    rates = {"t90s": t90s}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for rate, total in RATES.items():
+            rates[rate] = np.where(t90s > 0, totals[total].to_numpy(dtype=float) / t90s, np.nan)
+    return pd.DataFrame(rates, index=totals.index)
+
+
+def _add_rates(table, rows=None):
+    """(Re)compute 90s and the per-90 rates, for `rows` only if given."""
+    if rows is None:
+        return pd.concat([table[TOTALS], _rates(table)], axis=1)
+    table.loc[rows, ["t90s"] + list(RATES)] = _rates(table.loc[rows]).to_numpy()
+    return table
+
+
+def build(apps):
+    """Aggregate table over every player and season in `apps`."""
+    return _add_rates(_totals(apps)).sort_index()
+
+
+def update(table, new_apps):
+    """Return a copy of `table` with the appearances in `new_apps` folded in.
+
+    Only the player-seasons present in `new_apps` are recomputed.
+    """
+    delta = _totals(new_apps)
+    table = table.copy()
+    existing = delta.index[delta.index.isin(table.index)]
+    added = delta.index[~delta.index.isin(table.index)]
+
+    table.loc[existing, TOTALS] = table.loc[existing, TOTALS] + delta.loc[existing, TOTALS]
+    if len(added):
+        table = pd.concat([table, delta.loc[added]]).sort_index()
+    return _add_rates(table, delta.index)
+
+
+def player_seasons(table, players):
+    """All seasons of `players`, as a flat frame with PlayerName and season columns."""
+    names = table.index.get_level_values("PlayerName")
+    return table[names.isin(list(players))].reset_index()
+
+
+def compare(table, players, seasons):
+    """Totals and per-90 rates of each player summed over `seasons`, one row per player in order."""
+    names = table.index.get_level_values("PlayerName")
+    years = table.index.get_level_values("season")
+    rows = table[names.isin(list(players)) & years.isin([int(s) for s in seasons])]
+    totals = rows.groupby(level="PlayerName")[TOTALS].sum().reindex(list(players))
+    return _add_rates(totals)
+
+
+def lookup(table, player, season):
+    """One player-season row; all NaN if the player has no appearances that season."""
+    return table.reindex([(player, int(season))]).iloc[0]
+
+
+_table = data_loader.Shared("aggregates.build", build)
+
+
+def extend(replaced):
+    """Fold the appearances appended to the shared table's source frame into it
+    (`replaced` as returned by data_loader.append)."""
+    for old, new in replaced:
+        def fold(table, rows=new.iloc[len(old):]):
+            with timings.timer("aggregates.update"):
+                return update(table, rows)
+        _table.carry(old, new, fold)
+
+
+def get_table():
+    """Return the shared aggregate table, rebuilding it if the appearances reloaded."""
+    return _table.get(data_loader.load_section("player_seasons"))
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Headless analytics engine behind the comparison page.
+
+Every number the page shows is computed here from the shared, process-wide
+data (data_loader, identifiers, player_index, shot_partitions, aggregates,
+form, assist_network, similarity, percentiles, leaderboard), without importing Streamlit, so the same functions
+serve the page, analytics_service.py and batch jobs. All functions take a list of players
+and a list of seasons and return DataFrames keyed by player, except the league-wide
+partnerships and leaderboard.
+"""
+
+import pandas as pd
+
+import aggregates
+import assist_network
+import columnar_store
+import data_loader
+import form
+import identifiers
+import leaderboard
+import percentiles
+import player_index
+import shot_partitions
+import similarity
+import timings
+
+PLAYER_INFO = ['Age','Nationality','Position','Foot','Club']
+
+SHOT_RESULT_COLORS = {'MissedShots':'red', 'SavedShot':'green', 'ShotOnPost':'blue', 'BlockedShot':'black','Goal':'#b94b75'}
+
+#One colour (plotly/matplotlib) and one heat map colour map per compared player, in selection order
+PLAYER_COLORS = ['#FF0000', '#008080', '#1f77b4', '#ff7f0e', '#9467bd',
+                 '#2ca02c', '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22']
+PLAYER_CMAPS = ['Reds', 'Blues', 'PuBu', 'Oranges', 'Purples',
+                'Greens', 'YlOrBr', 'RdPu', 'Greys', 'YlGn']
+
+
+@timings.timed("analytics.player_info")
+def player_info(players):
+    """Age, nationality, position, foot and club; one column per player."""
+    df_players = data_loader.load_table("players")
+    return df_players.set_index("Player Name").reindex(list(players))[PLAYER_INFO].T
+
+
+@timings.timed("analytics.season_trends")
+def season_trends(players):
+    """Season totals and per-90 rates of every season the players appear in."""
+    return aggregates.player_seasons(aggregates.get_table(), players)
+
+
+@timings.timed("analytics.form")
+def rolling_form(players, seasons, window=form.DEFAULT_WINDOW):
+    """Goals, xG, xG per 90 and goals/xG over every `window` consecutive matches in `seasons`."""
+    return form.get_table().rolling(players, seasons, window)
+
+
+@timings.timed("analytics.radar_values")
+def radar_values(players, seasons):
+    """Per-90 radar metrics of each player summed over `seasons`, one row per player."""
+    return aggregates.compare(aggregates.get_table(), players, seasons)[aggregates.RADAR_METRICS]
+
+
+@timings.timed("analytics.radar_ranges")
+def radar_ranges(seasons):
+    """Low and high of each radar metric: the 5th and 95th percentile of all player-seasons in `seasons`."""
+    low, high = percentiles.get_table().ranges(seasons)
+    return pd.DataFrame([low, high], index=["low", "high"], columns=aggregates.RADAR_METRICS)
+
+
+@timings.timed("analytics.radar_percentiles")
+def radar_percentiles(players, seasons):
+    """Percentile rank (0-100) of each player's radar metrics among all player-seasons in `seasons`."""
+    values = radar_values(players, seasons)
+    ranks = percentiles.get_table().ranks(values.to_numpy(dtype=float), seasons)
+    return pd.DataFrame(ranks, index=values.index, columns=aggregates.RADAR_METRICS)
+
+
+@timings.timed("analytics.radar_chart_args")
+def radar_chart_args(players, seasons):
+    """(values, low, high, ranks) for figures.radar_chart: each player's rounded radar values, the
+    percentile ranges, or None ranges (the chart's defaults) when `seasons` have no population,
+    and each player's whole percentile ranks (None where there is no rank)."""
+    frame = radar_values(players, seasons)
+    values = [tuple(row) for row in frame.round(2).itertuples(index=False)]
+    ranks = percentiles.get_table().ranks(frame.to_numpy(dtype=float), seasons).round(0)
+    ranks = [tuple(None if pd.isna(r) else int(r) for r in row) for row in ranks]
+    ranges = radar_ranges(seasons).round(2)
+    if ranges.isna().values.any():
+        return values, None, None, ranks
+    return values, ranges.loc['low'].tolist(), ranges.loc['high'].tolist(), ranks
+
+
+@timings.timed("analytics.player_totals")
+def player_totals(players, seasons):
+    """All totals and per-90 rates of each player summed over `seasons`."""
+    return aggregates.compare(aggregates.get_table(), players, seasons)
+
+
+@timings.timed("analytics.open_play_shots")
+def open_play_shots(players, seasons):
+    """Open play shots of the players with coordinates in pitch metres (105x68).
+
+    Shots are looked up by the players' IDs; shooterName is added for display.
+    Leagues with shot partitions are read from them, the shots table otherwise.
+    """
+    ids = identifiers.player_ids(players)
+    columns = columnar_store.SECTION_COLUMNS["shot_maps"][1]
+    leagues = shot_partitions.leagues()
+    #only the selected seasons' partitions, already in metres
+    indexes = [shot_partitions.index(path) for path in shot_partitions.partitions(seasons, leagues)]
+    shots = [index.lookup(player_id, 'OpenPlay')[columns] for player_id in ids for index in indexes]
+    if not shot_partitions.table_partitioned() and len(ids) and len(seasons):
+        shot_index = player_index.get_index("shot_maps", "shooter")
+        table_shots = shot_index.lookup_many([(player_id, int(season), 'OpenPlay')
+                                              for player_id in ids for season in seasons]).copy()
+        #Apply pitch dimensions to the coordinates
+        table_shots["positionX"] = round(table_shots["positionX"]*105,2)
+        table_shots["positionY"] = round(table_shots["positionY"]*68,2)
+        shots.append(table_shots)
+    shots = pd.concat(shots) if shots else pd.DataFrame(columns=columns)
+    return identifiers.with_names(shots)
+
+
+@timings.timed("analytics.shot_types")
+def shot_types(shots):
+    """Goals by body part per shooter, from the output of open_play_shots."""
+    goals = shots[shots["shotResult"] == 'Goal']
+    return goals.groupby(['shooterName','shotType'], as_index=False, observed=True).agg(
+        goals = ("shotResult", "count"))
+
+
+@timings.timed("analytics.shot_results")
+def shot_results(shots):
+    """Shot count and xG by outcome per shooter, from the output of open_play_shots."""
+    return shots.groupby(['shooterName','shotResult'], as_index=False, observed=True).agg(
+        shots = ("shotResult", "count"),
+        xGoals=("xGoal", "sum"))
+
+
+def _partners(direction, player_col, partner_col, value_name, players, seasons, top):
+    network = assist_network.get_network()
+    data = pd.concat([network.partners(player, seasons, direction, top) for player in players],
+                     ignore_index=True)
+    return data.rename(columns={"player": player_col, "partner": partner_col, "xG": value_name})
+
+
+@timings.timed("analytics.assisters_to")
+def assisters_to(players, seasons, top=10):
+    """Top `top` assisters to each player by xG of the shots they set up."""
+    return _partners("shooter", "shooterName", "assisterName", "xGoals", players, seasons, top)
+
+
+@timings.timed("analytics.assisted_by")
+def assisted_by(players, seasons, top=10):
+    """Top `top` shooters each player assisted, by xG of the shots set up."""
+    return _partners("assister", "assisterName", "shooterName", "xAssist", players, seasons, top)
+
+
+@timings.timed("analytics.partnerships")
+def partnerships(seasons, top=10):
+    """Strongest shooter-assister pairs of the whole league by xG of the shots set up."""
+    return assist_network.get_network().strongest(seasons, top).rename(columns={"xG": "xGoals"})
+
+
+@timings.timed("analytics.similar_players")
+def similar_players(player, season, top=5, exclude=()):
+    """The `top` player-seasons of `season` with the per-90 profile closest to `player`'s."""
+    return similarity.get_index().similar(player, season, top, exclude=exclude)
+
+
+@timings.timed("analytics.leaderboard")
+def leaderboard_top(metric, seasons, top=10, min_minutes=aggregates.MIN_MINUTES, positions=None):
+    """The `top` player-seasons of `seasons` by `metric` (see leaderboard.METRICS), with at least
+    `min_minutes` and, if given, a position group in `positions` (see leaderboard.POSITION_GROUPS)."""
+    return leaderboard.get_board().top(metric, seasons, top, min_minutes, positions)
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+JSON HTTP service in front of analytics.py.
+
+    python analytics_service.py [--host 127.0.0.1] [--port 8502]
+
+Each connection is served on its own thread (HTTP/1.1 keep-alive), all of
+them sharing the one in-memory dataset, which is loaded before the server
+starts accepting requests. Query parameters:
+
+    players   comma separated player names (required)
+    seasons   a season or a range, e.g. 2020 or 2017-2020 (default: all)
+    top       number of partners for /assisters and /assisted (default 10)
+    window    matches per window for /form (default 5)
+    metric, min_minutes, positions
+              leaderboard metric (default xG90), minutes threshold (default 900)
+              and comma separated position groups, e.g. FW,AM, for /leaderboard
+
+Endpoints: /players /trends /form /totals /radar /radar_ranges /percentiles
+/shot_types /shot_results
+/assisters /assisted, /partnerships and /leaderboard (league-wide, no players), /similar
+(players most similar to the first player in the last season), plus /stats with p50/p99 latency per endpoint and
+/metrics with the per-stage histograms of timings.py in Prometheus format.
+The static reports written by reports.py are served under /reports/.
+
+POST /ingest with a JSON body {"shots": [...], "apps": [...]} (lists of
+row objects with the CSV columns, shots optionally with a league) appends a
+new match, see ingest.py.
+"""
+
+import argparse
+import json
+import logging
+import mimetypes
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+import aggregates
+import analytics
+import assist_network
+import data_loader
+import form
+import ingest
+import leaderboard
+import percentiles
+import player_index
+import reports
+import similarity
+import timings
+
+logger = logging.getLogger(__name__)
+
+SEASONS = [2016, 2017, 2018, 2019, 2020]
+
+
+def _players(query):
+    players = [p for p in query.get("players", [""])[0].split(",") if p]
+    if not players:
+        raise ValueError("players is required")
+    return players
+
+
+def _seasons(query):
+    value = query.get("seasons", [""])[0]
+    if not value:
+        return SEASONS
+    first, _, last = value.partition("-")
+    first, last = int(first), int(last or first)
+    if first > last:
+        raise ValueError(f"seasons {value}: the first season is after the last")
+    return list(range(first, last + 1))
+
+
+def _positive(query, name, default):
+    value = int(query.get(name, [str(default)])[0])
+    if value < 1:
+        raise ValueError(f"{name} must be at least 1")
+    return value
+
+
+def _top(query):
+    return _positive(query, "top", 10)
+
+
+def _leaderboard(query):
+    positions = [p for p in query.get("positions", [""])[0].split(",") if p]
+    unknown = set(positions) - set(leaderboard.POSITION_GROUPS)
+    if unknown:
+        raise ValueError(f"unknown positions {', '.join(sorted(unknown))}")
+    return analytics.leaderboard_top(query.get("metric", ["xG90"])[0], _seasons(query), _top(query),
+                                     float(query.get("min_minutes", [str(aggregates.MIN_MINUTES)])[0]),
+                                     positions)
+
+
+def _window(query):
+    return _positive(query, "window", form.DEFAULT_WINDOW)
+
+
+ENDPOINTS = {
+    "/players": lambda q: analytics.player_info(_players(q)).reset_index().rename(columns={"index": "field"}),
+    "/trends": lambda q: analytics.season_trends(_players(q)),
+    "/form": lambda q: analytics.rolling_form(_players(q), _seasons(q), _window(q)),
+    "/totals": lambda q: analytics.player_totals(_players(q), _seasons(q)).reset_index(),
+    "/radar": lambda q: analytics.radar_values(_players(q), _seasons(q)).reset_index(),
+    "/radar_ranges": lambda q: analytics.radar_ranges(_seasons(q)).reset_index().rename(columns={"index": "bound"}),
+    "/percentiles": lambda q: analytics.radar_percentiles(_players(q), _seasons(q)).reset_index(),
+    "/shot_types": lambda q: analytics.shot_types(analytics.open_play_shots(_players(q), _seasons(q))),
+    "/shot_results": lambda q: analytics.shot_results(analytics.open_play_shots(_players(q), _seasons(q))),
+    "/assisters": lambda q: analytics.assisters_to(_players(q), _seasons(q), _top(q)),
+    "/assisted": lambda q: analytics.assisted_by(_players(q), _seasons(q), _top(q)),
+    "/partnerships": lambda q: analytics.partnerships(_seasons(q), _top(q)),
+    "/leaderboard": _leaderboard,
+    "/similar": lambda q: analytics.similar_players(_players(q)[0], _seasons(q)[-1], _top(q), _players(q)),
+}
+
+
+class LatencyStats:
+    """Rolling window of request latencies per endpoint."""
+
+    def __init__(self, window=10000):
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+        self._counts = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, seconds):
+        with self._lock:
+            self._samples[endpoint].append(seconds)
+            self._counts[endpoint] += 1
+
+    def report(self):
+        with self._lock:
+            snapshot = {e: np.array(s) for e, s in self._samples.items()}
+            counts = dict(self._counts)
+        return {e: {"count": counts[e],
+                    "p50_ms": round(float(np.percentile(s, 50)) * 1000, 3),
+                    "p99_ms": round(float(np.percentile(s, 99)) * 1000, 3)}
+                for e, s in snapshot.items()}
+
+
+stats = LatencyStats()
+
+
+class AnalyticsHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"       # keep connections open between requests
+
+    def do_GET(self):
+        start = time.perf_counter()
+        url = urlparse(self.path)
+        endpoint = ENDPOINTS.get(url.path)
+        if url.path == "/stats":
+            self._send(200, json.dumps(stats.report()))
+            return
+        if url.path == "/metrics":
+            self._send(200, timings.prometheus(), "text/plain; version=0.0.4")
+            return
+        if url.path == "/reports" or url.path.startswith("/reports/"):
+            self._send_report(url.path[len("/reports/"):])
+            return
+        if endpoint is None:
+            self._send(404, json.dumps({"error": f"unknown endpoint {url.path}"}))
+            return
+        try:
+            frame = endpoint(parse_qs(url.query))
+        except ValueError as exc:
+            self._send(400, json.dumps({"error": str(exc)}))
+            return
+        except Exception:
+            logger.exception("GET %s failed", self.path)
+            self._send(500, json.dumps({"error": "internal error"}))
+            return
+        self._send(200, '{"data": ' + frame.to_json(orient="records") + '}')
+        stats.record(url.path, time.perf_counter() - start)
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/ingest":
+            self._send(404, json.dumps({"error": f"unknown endpoint {self.path}"}))
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if not isinstance(body, dict):
+                raise ValueError('body must be an object {"shots": [...], "apps": [...]}')
+            batches = {name: pd.DataFrame(body[name]) for name in ("shots", "apps") if body.get(name)}
+            summary = ingest.append(**batches)
+        except (ValueError, TypeError) as exc:
+            self._send(400, json.dumps({"error": str(exc)}))
+            return
+        except Exception:
+            logger.exception("POST %s failed", self.path)
+            self._send(500, json.dumps({"error": "internal error"}))
+            return
+        self._send(200, json.dumps(summary))
+
+    def _send_report(self, relative):
+        root = os.path.realpath(reports.REPORT_DIR)
+        path = os.path.realpath(os.path.join(root, relative))
+        if os.path.isdir(path):
+            path = os.path.join(path, "index.html")
+        if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+            self._send(404, json.dumps({"error": f"no report {relative}"}))
+            return
+        with open(path, "rb") as f:
+            self._send(200, f.read(), mimetypes.guess_type(path)[0] or "application/octet-stream")
+
+    def _send(self, status, body, content_type="application/json"):
+        if isinstance(body, str):
+            body = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def warm_up():
+    """Load the shared tables, indexes and aggregates before serving."""
+    aggregates.get_table()
+    form.get_table()
+    leaderboard.get_board()
+    assist_network.get_network()
+    similarity.get_index()
+    percentiles.get_table()
+    for section, names in player_index.INDEXES.items():
+        for name in names:
+            player_index.get_index(section, name)
+    data_loader.load_table("players")
+
+
+def make_server(host="127.0.0.1", port=8502):
+    warm_up()
+    server = ThreadingHTTPServer((host, port), AnalyticsHandler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the analytics engine over HTTP/JSON")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port)
+    print(f"serving on http://{args.host}:{server.server_address[1]}")
+    server.serve_forever()
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+Sparse shooter x assister network behind the Player Relationships tables.
+
+Every assisted shot is an edge from its assister to its shooter. The
+network holds one sparse matrix per metric (key passes, assists, summed
+xG) and direction, keyed by shooterID/assisterID, with a row per (season,
+player) and a column per partner. It is built once per loaded shots (the
+shots table and the edges summed in each league's partitions, see
+shot_partitions.sections) with vectorised ops, so a
+player's top partners over any seasons are one sparse row-sum of each
+matrix, and league-wide queries such as the strongest partnerships are a
+top-k over the seasons' blocks.
+
+Players are identified by ID, so namesakes (e.g. two Emersons) are
+kept apart; a name selected on the page stands for all of its IDs, and
+partners are named through the shared dictionary (identifiers.py) only
+when a table is returned.
+
+scipy is imported on first build, so importing this module stays cheap.
+"""
+
+import numpy as np
+import pandas as pd
+
+import data_loader
+import identifiers
+import shot_partitions
+
+METRICS = ["KeyPasses", "Assists", "xG"]
+
+
+def edges(shots):
+    """KeyPasses, Assists and xG of the assisted shots of `shots` (section "assists") per season, shooterID
+    and assisterID."""
+    assisted = shots[shots["assisterID"].notna()]
+    return (assisted.assign(KeyPasses=1, Assists=(assisted["shotResult"] == "Goal").astype(np.int64),
+                            xG=assisted["xGoal"].astype(float))
+            .groupby(["season", "shooterID", "assisterID"], as_index=False, observed=True, sort=False)[METRICS]
+            .sum())
+
+
+class AssistNetwork:
+    """Per-season sparse partner matrices of assist edges (see edges())."""
+
+    def __init__(self, edges):
+        from scipy import sparse
+
+        shooter = edges["shooterID"].to_numpy().astype(np.int64)
+        assister = edges["assisterID"].to_numpy().astype(np.int64)
+        self.ids, nodes = np.unique(np.r_[shooter, assister], return_inverse=True)
+        shooter, assister = nodes[:len(shooter)], nodes[len(shooter):]
+        n = len(self.ids)
+
+        #an edge may be listed once per source; the matrices sum duplicates
+        values = {metric: edges[metric].to_numpy(dtype=float) for metric in METRICS}
+        self.seasons, season = np.unique(edges["season"].to_numpy(), return_inverse=True)
+        self.seasons = [int(s) for s in self.seasons]
+        #direction -> metric -> csr matrix, row season * n + player of that direction, column partner
+        shape = (len(self.seasons) * n, n)
+        self.matrices = {
+            direction: {metric: sparse.csr_matrix((v, (season * n + rows, cols)), shape=shape)
+                        for metric, v in values.items()}
+            for direction, rows, cols in (("shooter", shooter, assister), ("assister", assister, shooter))}
+
+    def nodes(self, player):
+        """Matrix rows of every player ID that goes by `player`."""
+        ids = identifiers.get_dictionary().player_ids(player)
+        nodes = np.searchsorted(self.ids, ids)
+        return nodes[np.isin(ids, self.ids)]
+
+    def names(self, nodes):
+        """Display names of matrix rows."""
+        return np.asarray(identifiers.get_dictionary().names(self.ids[nodes]), dtype=object)
+
+    def _blocks(self, seasons):
+        return [self.seasons.index(int(s)) for s in seasons if int(s) in self.seasons]
+
+    def _row_sum(self, direction, seasons, nodes):
+        """1 x n sparse sum of each metric over the rows of `nodes` in `seasons`."""
+        from scipy import sparse
+
+        n = len(self.ids)
+        rows = np.add.outer(np.array(self._blocks(seasons), dtype=np.int64) * n, nodes).ravel()
+        selector = sparse.csr_matrix((np.ones(len(rows)), (np.zeros(len(rows), dtype=np.int64), rows)),
+                                     shape=(1, len(self.seasons) * n))
+        return {metric: selector @ matrix for metric, matrix in self.matrices[direction].items()}
+
+    def partners(self, player, seasons, direction="shooter", top=10):
+        """Top `top` partners of `player` by xG: the assisters to a shooter or the shooters an assister set up.
+
+        Returns player, partner, KeyPasses, Assists and xG columns.
+        """
+        total = self._row_sum(direction, seasons, self.nodes(player))
+        key_passes = total["KeyPasses"].tocoo()
+        partners = key_passes.col
+        xg = total["xG"].toarray().ravel()[partners]
+        order = np.lexsort((partners, -xg))[:top]
+        partners = partners[order]
+        return pd.DataFrame({"player": player,
+                             "partner": self.names(partners),
+                             "KeyPasses": key_passes.data[order].astype(np.int64),
+                             "Assists": total["Assists"].toarray().ravel()[partners].astype(np.int64),
+                             "xG": xg[order]},
+                            columns=["player", "partner"] + METRICS)
+
+    def strongest(self, seasons, top=10, metric="xG"):
+        """League-wide top `top` (shooter, assister) pairs by `metric` over `seasons`."""
+        from scipy import sparse
+
+        n = len(self.ids)
+        total = {name: sum((matrix[b * n:(b + 1) * n] for b in self._blocks(seasons)), sparse.csr_matrix((n, n)))
+                 for name, matrix in self.matrices["shooter"].items()}
+        ranked = total[metric].tocoo()
+        order = np.argpartition(-ranked.data, top)[:top] if len(ranked.data) > top else np.arange(len(ranked.data))
+        order = order[np.argsort(-ranked.data[order], kind="stable")]
+        shooters, assisters = ranked.row[order], ranked.col[order]
+        frame = pd.DataFrame({"shooterName": self.names(shooters), "assisterName": self.names(assisters)})
+        for name in METRICS:
+            frame[name] = np.asarray(total[name][shooters, assisters]).ravel() if len(order) else 0.0
+        return frame.astype({"KeyPasses": np.int64, "Assists": np.int64})
+
+
+def _build(partitions, table):
+    return AssistNetwork(pd.concat([frame for frame in (partitions, table if table is None else edges(table))
+                                    if frame is not None], ignore_index=True))
+
+
+_network = data_loader.Shared("assist_network.build", _build)
+
+
+def get_network():
+    """Return the shared network of every league's shots, rebuilding it if they reloaded."""
+    return _network.get(*shot_partitions.sections("assists", edges))
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+pytest-benchmark suite for every section of the comparison page.
+
+Each benchmark runs one stage of FootballAnalytics.py headlessly for a
+representative pair of players, on the real tables and on synthetic
+tables scaled 10x, 100x (and 1000x on request) beyond them (see
+conftest.py). Stages are grouped by name so each table shows one stage
+across scales:
+
+    pip install pytest-benchmark
+    python -m pytest benchmarks/bench_page.py --scales 1,10,100,1000
+
+Results are tracked over time by saving each run and comparing against
+the previous one:
+
+    python -m pytest benchmarks/bench_page.py --benchmark-autosave --benchmark-storage=benchmarks/results
+    python -m pytest benchmarks/bench_page.py --benchmark-storage=benchmarks/results \\
+        --benchmark-compare --benchmark-compare-fail=mean:25%
+
+Figure renders only depend on the selection, which is the same at every
+scale, so they are run on the real tables only; "league shot map" draws
+every open play shot of the seasons and so grows with the table. "render page figures"
+renders all of a page's figures at once, in the calling thread and on the
+render pool.
+"""
+
+import matplotlib
+matplotlib.use("Agg")
+import pytest
+
+import aggregates
+import analytics
+import assist_network
+import columnar_store
+import data_loader
+import figures
+import form
+import leaderboard
+import percentiles
+import player_index
+import render_pool
+import shot_density
+import similarity
+
+PAIR = ("Harry Kane", "Mohamed Salah")
+SELECTIONS = {"2020": (2020,), "2016-2020": (2016, 2017, 2018, 2019, 2020)}
+COLORS = ["#FF0000", "#008080"]
+
+
+@pytest.fixture(params=list(SELECTIONS), ids=list(SELECTIONS))
+def seasons(request):
+    return SELECTIONS[request.param]
+
+
+@pytest.fixture
+def shots(data, seasons):
+    return analytics.open_play_shots(PAIR, seasons)
+
+
+def _unscaled(data):
+    if data.scale != 1:
+        pytest.skip("figures depend on the selection, not on the table size")
+
+
+def _render(benchmark, builder, *args, **kwargs):
+    benchmark.pedantic(lambda: figures.to_png(builder(*args, **kwargs)), rounds=3, iterations=1, warmup_rounds=1)
+
+
+##################################Data load#############################
+
+@pytest.mark.benchmark(group="load shots")
+def test_load_shots(benchmark, data):
+    name, columns = columnar_store.SECTION_COLUMNS["shot_maps"]
+    benchmark(columnar_store.read, columnar_store.store_path(data.data_dir, name), columns)
+
+
+@pytest.mark.benchmark(group="load appearances")
+def test_load_apps(benchmark, data):
+    name, columns = columnar_store.SECTION_COLUMNS["player_seasons"]
+    benchmark(columnar_store.read, columnar_store.store_path(data.data_dir, name), columns)
+
+
+@pytest.mark.benchmark(group="build shot index")
+def test_build_shot_index(benchmark, data):
+    frame = data_loader.load_section("shot_maps")
+    benchmark(player_index.GroupIndex, frame, player_index.INDEXES["shot_maps"]["shooter"])
+
+
+@pytest.mark.benchmark(group="build assist network")
+def test_build_assist_network(benchmark, data):
+    benchmark(lambda shots: assist_network.AssistNetwork(assist_network.edges(shots)),
+              data_loader.load_section("assists"))
+
+
+@pytest.mark.benchmark(group="build aggregates")
+def test_build_aggregates(benchmark, data):
+    benchmark(aggregates.build, data_loader.load_section("player_seasons"))
+
+
+##################################Page sections#############################
+
+@pytest.mark.benchmark(group="general information")
+def test_player_info(benchmark, data):
+    benchmark(analytics.player_info, PAIR)
+
+
+@pytest.mark.benchmark(group="filter open play shots")
+def test_filter(benchmark, data, seasons):
+    player_index.get_index("shot_maps", "shooter")
+    benchmark(analytics.open_play_shots, PAIR, seasons)
+
+
+@pytest.mark.benchmark(group="season trends")
+def test_season_trends(benchmark, data):
+    aggregates.get_table()
+    benchmark(analytics.season_trends, PAIR)
+
+
+@pytest.mark.benchmark(group="rolling form")
+def test_rolling_form(benchmark, data, seasons):
+    form.get_table()
+    benchmark(analytics.rolling_form, PAIR, seasons, 5)
+
+
+@pytest.mark.benchmark(group="radar values")
+def test_radar_values(benchmark, data, seasons):
+    aggregates.get_table()
+    benchmark(analytics.radar_values, PAIR, seasons)
+
+
+@pytest.mark.benchmark(group="radar percentiles")
+def test_radar_percentiles(benchmark, data, seasons):
+    percentiles.get_table()
+    benchmark(lambda: (analytics.radar_ranges(seasons), analytics.radar_percentiles(PAIR, seasons)))
+
+
+@pytest.mark.benchmark(group="pies")
+def test_pies(benchmark, data, shots):
+    benchmark(lambda: (analytics.shot_types(shots), analytics.shot_results(shots)))
+
+
+@pytest.mark.benchmark(group="assister tables")
+def test_assister_tables(benchmark, data, seasons):
+    assist_network.get_network()
+    benchmark(lambda: (analytics.assisters_to(PAIR, seasons), analytics.assisted_by(PAIR, seasons)))
+
+
+@pytest.mark.benchmark(group="league partnerships")
+def test_partnerships(benchmark, data, seasons):
+    assist_network.get_network()
+    benchmark(analytics.partnerships, seasons)
+
+
+@pytest.mark.benchmark(group="leaderboard")
+def test_leaderboard(benchmark, data, seasons):
+    leaderboard.get_board()
+    benchmark(analytics.leaderboard_top, "xG90", seasons, 10, aggregates.MIN_MINUTES, ["FW", "AM"])
+
+
+@pytest.mark.benchmark(group="build leaderboard")
+def test_build_leaderboard(benchmark, data):
+    table, apps = aggregates.get_table(), data_loader.load_section("positions")
+    benchmark(lambda: leaderboard.Leaderboard(table, leaderboard.position_groups(apps)))
+
+
+@pytest.mark.benchmark(group="similar players")
+def test_similar_players(benchmark, data):
+    similarity.get_index()
+    benchmark(analytics.similar_players, PAIR[0], 2020)
+
+
+@pytest.mark.benchmark(group="league shot density")
+def test_league_density(benchmark, data):
+    #every open play shot of a season, the worst case for a heat map
+    frame = data_loader.load_section("shot_maps")
+    league = frame[(frame["season"] == 2020) & (frame["situation"] == "OpenPlay")]
+    x = league["positionX"].to_numpy(dtype=float) * shot_density.PITCH_LENGTH
+    y = league["positionY"].to_numpy(dtype=float) * shot_density.PITCH_WIDTH
+    benchmark(shot_density.density, x, y)
+
+
+##################################Figures#############################
+
+@pytest.mark.benchmark(group="render radar")
+def test_render_radar(benchmark, data, seasons):
+    _unscaled(data)
+    values = [tuple(v) for v in analytics.radar_values(PAIR, seasons).round(2).itertuples(index=False)]
+    ranges = analytics.radar_ranges(seasons).round(2)
+    _render(benchmark, figures.radar_chart, aggregates.RADAR_METRICS, PAIR, values, COLORS,
+            ranges.loc["low"].tolist(), ranges.loc["high"].tolist())
+
+
+@pytest.mark.benchmark(group="render kde heat map")
+def test_render_kde_heatmap(benchmark, data, shots):
+    _unscaled(data)
+    player = shots[shots["shooterName"] == PAIR[0]]
+    _render(benchmark, figures.kde_heatmap, player.positionX, player.positionY, "Reds")
+
+
+@pytest.mark.benchmark(group="render grid heat map")
+def test_render_grid_heatmap(benchmark, data, shots):
+    _unscaled(data)
+    player = shots[shots["shooterName"] == PAIR[0]]
+    _render(benchmark, figures.grid_heatmap, player.positionX, player.positionY, "Reds")
+
+
+@pytest.mark.benchmark(group="render shots scatter")
+def test_render_shots_scatter(benchmark, data, shots):
+    _unscaled(data)
+    _render(benchmark, figures.shots_scatter, [shots[shots["shooterName"] == p] for p in PAIR])
+
+
+@pytest.mark.benchmark(group="interactive shot map")
+def test_shot_map(benchmark, data, shots):
+    _unscaled(data)
+    import charts
+    benchmark(lambda: charts.shot_map([shots[shots["shooterName"] == p] for p in PAIR], PAIR,
+                                      analytics.SHOT_RESULT_COLORS).to_json())
+
+
+@pytest.mark.benchmark(group="league shot map")
+def test_league_shot_map(benchmark, data, seasons):
+    import charts
+    frame = data_loader.load_section("shot_maps")
+    league = frame[(frame["situation"] == "OpenPlay") & frame["season"].isin(seasons)]
+    league = league.assign(positionX=league["positionX"] * 105, positionY=league["positionY"] * 68)
+    benchmark(lambda: charts.shot_map([league], ["(all players)"], analytics.SHOT_RESULT_COLORS).to_json())
+
+
+@pytest.mark.benchmark(group="render page figures")
+@pytest.mark.parametrize("workers", [0, render_pool.WORKERS], ids=lambda w: f"{w}workers")
+def test_render_page_figures(benchmark, data, seasons, shots, workers):
+    _unscaled(data)
+    values = [tuple(v) for v in analytics.radar_values(PAIR, seasons).round(2).itertuples(index=False)]
+    jobs = [("radar_chart", (aggregates.RADAR_METRICS, PAIR, values, COLORS))]
+    for player in PAIR:
+        player_shots = shots[shots["shooterName"] == player]
+        jobs.append(("grid_heatmap", (player_shots.positionX, player_shots.positionY, "Reds")))
+    jobs.append(("shots_scatter", ([shots[shots["shooterName"] == p] for p in PAIR],)))
+
+    pool = render_pool.RenderPool(workers)
+    pool.submit("grid_heatmap", [], [], "Reds").result()     # start the workers outside the timing
+    benchmark.pedantic(lambda: [job.result() for job in [pool.submit(name, *args) for name, args in jobs]],
+                       rounds=3, iterations=1, warmup_rounds=1)
+    pool.shutdown()
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Synthetic data for the page benchmarks (bench_page.py).
+
+A table scaled N times is the real shots and appearances tables tiled N
+times, every copy after the first with its own players ("Harry Kane (3)")
+and player IDs and slightly jittered shot positions. The table grows the
+way a wider dataset would (more players, more leagues) while each real
+player keeps the same number of shots, so a stage whose time grows with
+the scale is paying for the whole table rather than for the selection.
+
+The scaled tables are written as a columnar store (see columnar_store.py)
+in a temporary data directory and data_loader is pointed at it, so every
+stage goes through the same loader, indexes and aggregates as the page.
+"""
+
+import os
+import shutil
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import columnar_store
+import data_loader
+
+#columns renamed per copy; ID columns are offset per copy instead
+PLAYER_COLUMNS = {"shots": ["shooterName", "assisterName"], "apps": ["PlayerName"]}
+ID_COLUMNS = {"shots": ["shooterID", "assisterID"], "apps": []}
+
+
+def pytest_addoption(parser):
+    parser.addoption("--scales", default="1,10,100",
+                     help="comma separated table scales to benchmark, e.g. 1,10,100,1000")
+
+
+def pytest_generate_tests(metafunc):
+    if "data" in metafunc.fixturenames:
+        scales = [int(s) for s in metafunc.config.getoption("scales").split(",")]
+        metafunc.parametrize("data", scales, indirect=True, scope="session", ids=lambda s: f"x{s}")
+
+
+def scale_table(name, frame, scale, seed=0):
+    """`frame` tiled `scale` times, each copy with its own players and IDs."""
+    n = len(frame)
+    copy = np.repeat(np.arange(scale), n)
+    #copies get IDs just above the real ones, so they stay exact in the ID columns' dtypes
+    id_offset = int(max([np.nanmax(frame[column].to_numpy(dtype=float)) for column in ID_COLUMNS[name]],
+                        default=0)) + 1
+    columns = {}
+    for column in frame.columns:
+        values = frame[column]
+        if column in PLAYER_COLUMNS[name]:
+            #new categories per copy; NaN (code -1) stays NaN
+            categories = values.cat.categories.astype(str)
+            codes = np.tile(values.cat.codes.to_numpy().astype(np.int64), scale)
+            codes = np.where(codes >= 0, codes + copy * len(categories), -1)
+            names = [c if i == 0 else f"{c} ({i})" for i in range(scale) for c in categories]
+            columns[column] = pd.Categorical.from_codes(codes, categories=names)
+        elif pd.api.types.is_categorical_dtype(values):
+            columns[column] = pd.Categorical.from_codes(np.tile(values.cat.codes.to_numpy(), scale),
+                                                        categories=values.cat.categories)
+        elif column in ID_COLUMNS[name]:
+            ids = np.tile(values.to_numpy(dtype=float), scale) + copy * id_offset
+            columns[column] = ids.astype(values.dtype)
+            if not np.array_equal(columns[column].astype(float), ids, equal_nan=True):
+                raise ValueError(f"{column} cannot hold the IDs of {scale} copies as {values.dtype}")
+        else:
+            columns[column] = np.tile(values.to_numpy(), scale)
+
+    table = pd.DataFrame(columns)
+    if name == "shots" and scale > 1:
+        rng = np.random.default_rng(seed)
+        jittered = slice(n, None)   # the real shots are left untouched
+        for column in ("positionX", "positionY"):
+            noise = rng.normal(0, 0.005, len(table) - n).astype(np.float32)
+            table.loc[jittered, column] = np.clip(table[column].to_numpy()[n:] + noise, 0, 1)
+    return table
+
+
+def write_dataset(data_dir, scale):
+    """Write the real tables scaled `scale` times as a data directory the loader can read."""
+    os.makedirs(os.path.join(data_dir, columnar_store.STORE_DIR), exist_ok=True)
+    shutil.copy(os.path.join(data_loader.DATA_DIR, data_loader.DATA_FILES["players"]), data_dir)
+    for name in columnar_store.SCHEMAS:
+        frame = scale_table(name, data_loader.load_table(name), scale)
+        store = columnar_store.store_path(data_dir, name)
+        columnar_store.write(frame, store)
+        #the loader only reads the CSV when it is newer than the store, so a header is enough
+        csv_path = os.path.join(data_dir, data_loader.DATA_FILES[name])
+        frame.head(0).to_csv(csv_path, index=False)
+        os.utime(csv_path, (0, 0))
+
+
+@pytest.fixture(scope="session")
+def data(request, tmp_path_factory):
+    """Point data_loader at the real data scaled `request.param` times."""
+    scale = request.param
+    data_dir = str(tmp_path_factory.mktemp(f"x{scale}"))
+    write_dataset(data_dir, scale)
+
+    real_dir = data_loader.DATA_DIR
+    data_loader.DATA_DIR = data_dir
+    yield SimpleNamespace(scale=scale, data_dir=data_dir)
+    data_loader.DATA_DIR = real_dir
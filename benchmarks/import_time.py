@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+Import-time regression benchmark for the app's cold start.
+
+Runs `python -X importtime` in a fresh interpreter on the modules the page
+imports before it renders anything (read from FootballAnalytics.py itself),
+prints the slowest imports and checks two things:
+
+* the app's own modules pull in none of the deferred heavy modules
+  (mplsoccer, seaborn, scipy, plotly, requests, and matplotlib/PIL beyond
+  what streamlit itself already loads), and
+* the import time of the app's own modules (streamlit's own import is
+  too noisy to gate on) has not regressed by more than --tolerance plus
+  --slack against benchmarks/import_baseline.json.
+
+    python benchmarks/import_time.py            # check
+    python benchmarks/import_time.py --update   # record a new baseline
+"""
+
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(ROOT, "benchmarks", "import_baseline.json")
+PAGE = os.path.join(ROOT, "FootballAnalytics.py")
+DEFERRED = ["matplotlib", "mplsoccer", "seaborn", "scipy", "plotly", "requests", "PIL"]
+
+
+def page_imports(path=PAGE):
+    """Top-level modules the page imports before its first st.* call, in order."""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules += [alias.name.split(".")[0] for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            modules.append(node.module.split(".")[0])
+        elif any(isinstance(child, ast.Attribute) and isinstance(child.value, ast.Name) and child.value.id == "st"
+                 for child in ast.walk(node)):
+            break
+    return list(dict.fromkeys(modules))
+
+
+PAGE_IMPORTS = page_imports()
+#the page's own modules, whose import time is gated
+APP_MODULES = [m for m in PAGE_IMPORTS if os.path.exists(os.path.join(ROOT, f"{m}.py"))]
+
+
+def profile(modules, runs=3):
+    """Best-of-`runs` (total, {module: cumulative microseconds}, {module: ...} of `modules` themselves)
+    for importing `modules`.
+
+    A module another one of `modules` imported first is counted in that
+    one's time only, so the total counts every import once.
+    """
+    best = None
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + ", ".join(modules)],
+                                cwd=ROOT, capture_output=True, text=True, check=True)
+        times, roots = {}, {}
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            _, cumulative, name = line[len("import time:"):].split("|")
+            times[name.strip()] = int(cumulative)
+            if name.strip() in modules and not name.startswith("  "):
+                roots[name.strip()] = int(cumulative)
+        total = sum(roots.values())
+        if best is None or total < best[0]:
+            best = (total, times, roots)
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import-time regression benchmark")
+    parser.add_argument("--update", action="store_true", help="write the current profile as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slow-down")
+    parser.add_argument("--slack", type=float, default=10.0, help="allowed absolute slow-down in ms")
+    parser.add_argument("--top", type=int, default=15, help="number of slowest imports to print")
+    args = parser.parse_args()
+
+    total, times, roots = profile(PAGE_IMPORTS)
+    print(f"{'module':<50}{'cumulative ms':>14}")
+    for name, us in sorted(times.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{name:<50}{us / 1000:>14.1f}")
+    app_total = sum(roots.get(m, 0) for m in APP_MODULES)
+    print(f"{'app modules (after streamlit)':<50}{app_total / 1000:>14.1f}")
+    print(f"{'total':<50}{total / 1000:>14.1f}")
+
+    failures = []
+    #modules streamlit loads anyway are not the app's to defer
+    _, streamlit_times, _ = profile(["streamlit"], runs=1)
+    app_only = set(times) - set(streamlit_times)
+    eager = sorted({name.split(".")[0] for name in app_only} & set(DEFERRED))
+    if eager:
+        failures.append(f"deferred modules imported eagerly: {', '.join(eager)}")
+
+    if args.update:
+        with open(BASELINE, "w") as f:
+            json.dump({"python": sys.version.split()[0], "total_us": total, "app_us": app_total}, f, indent=1)
+        print(f"baseline written to {BASELINE}")
+    elif os.path.exists(BASELINE):
+        with open(BASELINE) as f:
+            baseline = json.load(f)["app_us"]
+        limit = baseline * (1 + args.tolerance) + args.slack * 1000
+        print(f"app modules baseline {baseline / 1000:.1f} ms, limit {limit / 1000:.1f} ms")
+        if app_total > limit:
+            failures.append(f"app import time {app_total / 1000:.1f} ms is over the limit of {limit / 1000:.1f} ms")
+
+    for failure in failures:
+        print("FAIL:", failure)
+    sys.exit(1 if failures else 0)
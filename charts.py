@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+Plotly charts of the comparison page.
+
+Built from the outputs of analytics.py, so the page and the static
+reports (reports.py) draw the same charts. Importing this module imports
+plotly; the page does so in the first section that needs it.
+"""
+
+import numpy as np
+from plotly.subplots import make_subplots  #Interactive visualizations
+import plotly.graph_objects as go
+
+import shot_density
+
+#(column, title) of each season trend panel; None is Goals/xGoals
+TREND_PANELS = [("Shots", "Shots"), ("Goals", "Goals Scored"), ("Assists", "Assists"),
+                ("xGoals", "Expected Goals"), ("xG90", "Expected Goals per 90mins"),
+                (None, "Goals/Expected Goals")]
+
+
+def season_trends(xG_data, color):
+    """Six panels of season totals and rates, one line per player (analytics.season_trends)."""
+    fig = make_subplots(
+        rows=2, cols=3,
+        column_widths=[0.5, 0.5,0.5],
+        row_heights=[1.5,1.5],
+        specs=[[ {"type": "bar"}, {"type": "bar"}, {"type": "bar"}],[ {"type": "bar"}, {"type": "bar"}, {"type": "bar"}]],
+        subplot_titles=[title for _, title in TREND_PANELS])
+
+    for panel, (column, _) in enumerate(TREND_PANELS):
+        for lbl in xG_data['PlayerName'].unique():
+            dfp = xG_data[xG_data['PlayerName']==lbl]
+            fig.add_traces(go.Line(x=dfp['season'],
+                                   y=dfp.Goals/dfp.xGoals if column is None else dfp[column],
+                                   name=lbl,
+                                   marker_color = color[lbl],
+                                   showlegend=column == "xGoals"),   # Show legend for only one chart
+                           rows=panel // 3 + 1, cols=panel % 3 + 1)
+
+    fig.update_layout(autosize=False,height=500,
+          margin=dict(l=10, r=10, t=30, b=0))
+    fig.update_layout(legend = dict(orientation = "h",   # show entries horizontally
+                         xanchor = "center",yanchor = 'top',  # use center of legend as anchor
+                         x = 0.5))
+    return fig
+
+
+#(column, title) of each form panel
+FORM_PANELS = [("Goals", "Goals"), ("xGoals", "Expected Goals"),
+               ("xG90", "Expected Goals per 90mins"), ("GoalsPerxG", "Goals/Expected Goals")]
+
+
+def rolling_form(form, color, window):
+    """Four panels of rolling `window`-match totals and rates, one line per player (analytics.rolling_form)."""
+    fig = make_subplots(rows=1, cols=4,
+                        subplot_titles=[title for _, title in FORM_PANELS])
+
+    for panel, (column, _) in enumerate(FORM_PANELS):
+        for lbl in form['PlayerName'].unique():
+            dfp = form[form['PlayerName']==lbl]
+            fig.add_trace(go.Scatter(x=dfp['match'], y=dfp[column],
+                                     mode='lines',
+                                     name=lbl,
+                                     customdata=dfp['season'],
+                                     hovertemplate='match %{x} (%{customdata}): %{y:.2f}',
+                                     marker_color = color[lbl],
+                                     showlegend=panel == 0),
+                          row=1, col=panel + 1)
+
+    fig.update_xaxes(title_text=f"Match (last of {window})")
+    fig.update_layout(autosize=False,height=300,
+          margin=dict(l=10, r=10, t=30, b=0))
+    fig.update_layout(legend = dict(orientation = "h",   # show entries horizontally
+                         xanchor = "center",yanchor = 'top',  # use center of legend as anchor
+                         x = 0.5, y=-0.25))
+    return fig
+
+
+def _pies(data, players, values, labels, colors=None):
+    fig = make_subplots(
+        rows=1, cols=len(players),
+        specs=[[ {"type": "pie"} for player in players]],
+        subplot_titles=players)
+
+    for i, player in enumerate(players, start=1):
+        rows = data[data["shooterName"] == player]
+        marker = {"marker_colors": rows[labels].map(colors)} if colors else {}
+        fig.add_trace(go.Pie(
+                     values=rows[values],
+                     labels=rows[labels],
+                     legendgroup="group",
+                     hole=.4, **marker),
+                     row=1, col=i)
+    return fig
+
+
+def body_part_pies(shot_types, players):
+    """Goals by body part, one donut per player (analytics.shot_types)."""
+    fig = _pies(shot_types, players, "goals", "shotType")
+    fig.update_layout(legend = dict(orientation = "h",   # show entries horizontally
+                         xanchor = "center",yanchor = 'top',  # use center of legend as anchor
+                         x = 0.5))
+    fig.update_layout(autosize=False,height = 300,
+        margin=dict(l=10, r=10, t=30, b=0))
+    return fig
+
+
+def shot_outcome_pies(shot_results, players, colors):
+    """Shots by outcome, one donut per player (analytics.shot_results)."""
+    fig = _pies(shot_results, players, "shots", "shotResult", colors)
+    fig.update_layout(autosize=False,height= 350,
+         margin=dict(l=10, r=10, t=30, b=1))
+    fig.update_layout(legend = dict(orientation = "h",   # show entries horizontally
+                          xanchor = "center",  # use center of legend as anchor
+                          x = 0.5,y=-0.1))
+    return fig
+
+
+#Shot map: at most this many shots per player are sent to the browser, thinned by shot_density.thin
+SHOT_MAP_MAX_POINTS = 5000
+SHOT_MAP_RESULTS = ['MissedShots', 'SavedShot', 'ShotOnPost', 'BlockedShot', 'Goal']
+
+
+def _arc(cx, cy, r, start, stop, n=40):
+    t = np.linspace(np.radians(start), np.radians(stop), n)
+    return "M " + " L ".join(f"{cx + r * np.cos(a):.2f},{cy + r * np.sin(a):.2f}" for a in t)
+
+
+#attacking half of a 105x68 pitch drawn vertically, goal at the top: (x, y) = (positionY, positionX)
+HALF_PITCH = [
+    dict(type="rect", x0=0, x1=68, y0=52.5, y1=105),
+    dict(type="rect", x0=13.84, x1=54.16, y0=88.5, y1=105),        # penalty area
+    dict(type="rect", x0=24.84, x1=43.16, y0=99.5, y1=105),        # six-yard box
+    dict(type="line", x0=30.34, x1=37.66, y0=105, y1=105, line=dict(color="black", width=4)),   # goal
+    dict(type="path", path=_arc(34, 52.5, 9.15, 0, 180)),           # centre circle
+    dict(type="path", path=_arc(34, 94, 9.15, 217, 323)),          # penalty arc
+    dict(type="circle", x0=33.7, x1=34.3, y0=93.7, y1=94.3, fillcolor="black"),
+]
+
+
+def shot_map(shots_list, players, colors, max_points=SHOT_MAP_MAX_POINTS):
+    """Open play shots of each player on a WebGL half pitch, coloured by result and sized by xG.
+
+    All shots are sent once (thinned above `max_points` per player) and
+    the result buttons and the legend filter them in the browser.
+    """
+    fig = make_subplots(rows=1, cols=len(players), horizontal_spacing=0.02)
+    titles, traces, cols, results, shapes = [], [], [], [], []
+    for i, (shots, player) in enumerate(zip(shots_list, players), start=1):
+        keep = shot_density.thin(shots.positionX, shots.positionY, max_points)
+        titles.append(player if len(keep) == len(shots) else f"{player} ({len(keep)} of {len(shots)} shots)")
+        shots = shots.iloc[keep]
+        for result in SHOT_MAP_RESULTS:
+            rows = shots[shots["shotResult"] == result]
+            traces.append(go.Scattergl(x=rows.positionY, y=rows.positionX,
+                                       mode='markers',
+                                       name=result,
+                                       legendgroup=result,
+                                       showlegend=i == 1,
+                                       customdata=rows[["xGoal", "shotType", "season"]].astype({"shotType": str}).to_numpy(dtype=object),
+                                       hovertemplate='xG %{customdata[0]:.2f}, %{customdata[1]} (%{customdata[2]})',
+                                       marker=dict(size=np.sqrt(rows.xGoal.to_numpy(dtype=float) * 1900 + 100) / 2,
+                                                   color='rgba(0,0,0,0)',
+                                                   line=dict(width=1.5, color=colors[result]))))
+            cols.append(i)
+            results.append(result)
+        axis = "" if i == 1 else i
+        shapes += [dict(dict(line=dict(color="black", width=1)), xref=f"x{axis}", yref=f"y{axis}", layer="below", **shape)
+                   for shape in HALF_PITCH]
+        #pitch coordinates: fixed aspect, goal at the top, left wing on the left as in figures.shots_scatter
+        fig.update_layout({f"xaxis{axis}": dict(range=[72, -4], visible=False),
+                           f"yaxis{axis}": dict(range=[48.5, 109], visible=False, scaleanchor=f"x{axis}")})
+    #in one go: adding traces and shapes one at a time re-validates the whole figure each time
+    fig.add_traces(traces, rows=[1] * len(traces), cols=cols)
+    fig.update_layout(shapes=shapes)
+
+    buttons = [dict(label="All", method="restyle", args=[{"visible": [True] * len(results)}])]
+    buttons += [dict(label=result, method="restyle", args=[{"visible": [r == result for r in results]}])
+                for result in SHOT_MAP_RESULTS]
+    fig.update_layout(updatemenus=[dict(type="buttons", direction="right", buttons=buttons,
+                                        x=0.5, xanchor="center", y=1.12, yanchor="bottom")],
+                      annotations=[dict(text=title, x=sum(fig.layout[f"xaxis{i if i > 1 else ''}"].domain) / 2,
+                                        y=1.0, xref="paper", yref="paper",
+                                        xanchor="center", yanchor="bottom", showarrow=False)
+                                   for i, title in enumerate(titles, start=1)],
+                      legend=dict(orientation="h", xanchor="center", x=0.5, y=-0.02, title_text="Shot Result"),
+                      plot_bgcolor="rgba(0,0,0,0)",
+                      autosize=False, height=550,
+                      margin=dict(l=10, r=10, t=80, b=0))
+    return fig
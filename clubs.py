@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+League of every club in the data.
+
+shots_modified.csv and appearances_modified.csv cover the top five
+leagues (2016-2020) with no league column. A club only plays league
+matches against clubs of its own league, so the league of a match follows
+from either of its teams. League names are those of understat.com.
+"""
+
+LEAGUES = {
+    "EPL": (
+        "Arsenal", "Aston Villa", "Bournemouth", "Brighton", "Burnley", "Cardiff", "Chelsea",
+        "Crystal Palace", "Everton", "Fulham", "Huddersfield", "Hull", "Leeds", "Leicester", "Liverpool",
+        "Manchester City", "Manchester United", "Middlesbrough", "Newcastle United", "Norwich",
+        "Sheffield United", "Southampton", "Stoke", "Sunderland", "Swansea", "Tottenham", "Watford",
+        "West Bromwich Albion", "West Ham", "Wolverhampton Wanderers",
+    ),
+    "La_liga": (
+        "Alaves", "Athletic Club", "Atletico Madrid", "Barcelona", "Cadiz", "Celta Vigo",
+        "Deportivo La Coruna", "Eibar", "Elche", "Espanyol", "Getafe", "Girona", "Granada", "Las Palmas",
+        "Leganes", "Levante", "Malaga", "Mallorca", "Osasuna", "Rayo Vallecano", "Real Betis", "Real Madrid",
+        "Real Sociedad", "Real Valladolid", "SD Huesca", "Sevilla", "Sporting Gijon", "Valencia", "Villarreal",
+    ),
+    "Bundesliga": (
+        "Arminia Bielefeld", "Augsburg", "Bayer Leverkusen", "Bayern Munich", "Borussia Dortmund",
+        "Borussia M.Gladbach", "Darmstadt", "Eintracht Frankfurt", "FC Cologne", "Fortuna Duesseldorf",
+        "Freiburg", "Hamburger SV", "Hannover 96", "Hertha Berlin", "Hoffenheim", "Ingolstadt", "Mainz 05",
+        "Nuernberg", "Paderborn", "RasenBallsport Leipzig", "Schalke 04", "Union Berlin", "VfB Stuttgart",
+        "Werder Bremen", "Wolfsburg",
+    ),
+    "Serie_A": (
+        "AC Milan", "Atalanta", "Benevento", "Bologna", "Brescia", "Cagliari", "Chievo", "Crotone", "Empoli",
+        "Fiorentina", "Frosinone", "Genoa", "Inter", "Juventus", "Lazio", "Lecce", "Napoli", "Palermo",
+        "Parma Calcio 1913", "Pescara", "Roma", "SPAL 2013", "Sampdoria", "Sassuolo", "Spezia", "Torino",
+        "Udinese", "Verona",
+    ),
+    "Ligue_1": (
+        "Amiens", "Angers", "Bordeaux", "Brest", "Caen", "Dijon", "Guingamp", "Lens", "Lille", "Lorient",
+        "Lyon", "Marseille", "Metz", "Monaco", "Montpellier", "Nancy", "Nantes", "Nice", "Nimes",
+        "Paris Saint Germain", "Reims", "Rennes", "SC Bastia", "Saint-Etienne", "Strasbourg", "Toulouse",
+        "Troyes",
+    ),
+}
+LEAGUE = {club: league for league, clubs in LEAGUES.items() for club in clubs}
+
+
+def leagues(home, away):
+    """League of each match between the clubs of Series `home` and `away`; raises ValueError for unknown clubs."""
+    home, away = home.astype(object), away.astype(object)
+    found = home.map(LEAGUE)
+    found = found.where(found.notna(), away.map(LEAGUE))
+    if found.isna().any():
+        missing = found.isna()
+        raise ValueError(f"shots: no league known for {', '.join(sorted(set(home[missing]) | set(away[missing])))}, "
+                         f"give their league explicitly")
+    return found.to_numpy()
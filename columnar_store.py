@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+Typed columnar copy of the shots and appearances tables.
+
+`python columnar_store.py` converts the CSVs once into uncompressed Arrow
+IPC (Feather v2) files under store/. Repeated strings are dictionary
+encoded (pandas categoricals), pitch coordinates are float32 and counts
+use the smallest integer type that fits. The loader memory-maps the file
+and only materialises the columns a section asks for: each table is one
+record batch, so numeric columns without missing values become pandas
+columns over the mapped pages rather than copies (categoricals and columns
+with NaN are still decoded into memory).
+
+Rows appended later (ingest.py) go to small part files next to the
+table's file, store/<name>.<n>.feather, which read() concatenates; every
+COMPACT_PARTS appends the table and its parts are rewritten as one file.
+"""
+
+import argparse
+import functools
+import glob
+import os
+
+import pandas as pd
+import pyarrow as pa
+from pyarrow import feather
+
+STORE_DIR = "store"
+
+#Target dtype of every column we keep; anything not listed is left as parsed
+SCHEMAS = {
+    "shots": {
+        "season": "int16",
+        "shooterName": "category",
+        "assisterName": "category",
+        "HomeTeam": "category",
+        "AwayTeam": "category",
+        "gameID": "int32",
+        "shooterID": "int32",
+        "assisterID": "float64",   # NaN when the shot was unassisted; exact for any int32 ID
+        "minute": "int16",
+        "situation": "category",
+        "lastAction": "category",
+        "shotType": "category",
+        "shotResult": "category",
+        "xGoal": "float64",
+        "positionX": "float32",
+        "positionY": "float32",
+    },
+    "apps": {
+        "season": "int16",
+        "PlayerName": "category",
+        "HomeTeam": "category",
+        "AwayTeam": "category",
+        "goals": "int16",
+        "shots": "int16",
+        "xGoals": "float64",
+        "xGoalsChain": "float64",
+        "xGoalsBuildup": "float64",
+        "assists": "int16",
+        "keyPasses": "int16",
+        "xAssists": "float64",
+        "position": "category",
+        "positionOrder": "int16",
+        "yellowCard": "int8",
+        "redCard": "int8",
+        "time": "int16",
+    },
+}
+
+#Columns each page section reads, so a section never pays for the others. Players are
+#read by ID; their names are looked up in identifiers.py when they are shown
+SECTION_COLUMNS = {
+    "shot_maps": ("shots", ["season", "shooterID", "situation", "shotType",
+                            "shotResult", "xGoal", "positionX", "positionY"]),
+    "assists": ("shots", ["season", "shooterID", "assisterID", "shotResult", "xGoal"]),
+    #names of the shot IDs, read only by the shared player dictionary (identifiers.py)
+    "identifiers": ("shots", ["shooterID", "shooterName", "assisterID", "assisterName"]),
+    "player_seasons": ("apps", ["season", "PlayerName", "goals", "shots", "xGoals",
+                                "xGoalsChain", "xGoalsBuildup", "xAssists",
+                                "assists", "keyPasses", "time"]),
+    "positions": ("apps", ["season", "PlayerName", "positionOrder", "time"]),
+}
+
+
+#appends written as part files before the table is compacted back into one file
+COMPACT_PARTS = 8
+_FOLDED = b"store_parts"    # schema metadata: number of the last part file folded into the table's file
+
+
+def store_path(data_dir, name):
+    return os.path.join(data_dir, STORE_DIR, f"{name}.feather")
+
+
+def _parts(path):
+    """(number of the last part folded into `path`, [(n, part path)] of every part file on disk)."""
+    with pa.memory_map(path) as source:
+        metadata = pa.ipc.open_file(source).schema.metadata or {}
+    found = []
+    for part in glob.glob(f"{path[:-len('.feather')]}.*.feather"):
+        number = part[len(path) - len(".feather") + 1:-len(".feather")]
+        if number.isdigit():
+            found.append((int(number), part))
+    return int(metadata.get(_FOLDED, 0)), sorted(found)
+
+
+def parts(path):
+    """Part files of rows appended to the store file at `path` since it was last written, oldest first."""
+    folded, found = _parts(path)
+    return [part for number, part in found if number > folded]
+
+
+def mtime(path):
+    """Last modification of the store file at `path` or of any of its part files."""
+    stem = path[:-len(".feather")]
+    return max(os.path.getmtime(part) for part in [path] + glob.glob(f"{stem}.*.feather"))
+
+
+def _remove_parts(path):
+    for _, part in _parts(path)[1]:
+        try:
+            os.remove(part)
+        except FileNotFoundError:
+            pass
+
+
+def coerce(name, frame):
+    """Cast the columns of `frame` to the store schema of table `name`."""
+    schema = SCHEMAS[name]
+    dtypes = {c: t for c, t in schema.items() if c in frame.columns}
+    return frame.astype(dtypes)
+
+
+def write(frame, path, folded=0):
+    """Write `frame` as a store file: uncompressed and in one record batch, so that its
+    columns can be used in place from the memory map. `folded` is the number of the
+    last part file whose rows `frame` already holds."""
+    table = pa.Table.from_pandas(frame)
+    if folded:
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), _FOLDED: str(folded).encode()})
+    feather.write_feather(table, path, compression="uncompressed", chunksize=max(len(frame), 1))
+
+
+def convert(data_dir, csv_files):
+    """Write a typed .feather file for every table in SCHEMAS."""
+    os.makedirs(os.path.join(data_dir, STORE_DIR), exist_ok=True)
+    written = []
+    for name in SCHEMAS:
+        frame = coerce(name, pd.read_csv(os.path.join(data_dir, csv_files[name])))
+        path = store_path(data_dir, name)
+        if os.path.exists(path):
+            _remove_parts(path)     # their rows are in the CSV
+        write(frame, path)
+        written.append(path)
+    return written
+
+
+def concat(frame, rows):
+    """`frame` with `rows` appended, keeping categorical columns categorical.
+
+    New categories are added after the existing ones, so the codes of the
+    rows already in `frame` do not change.
+    """
+    frame = frame.copy()
+    rows = rows[list(frame.columns)].copy()
+    for column in frame.columns:
+        if pd.api.types.is_categorical_dtype(frame[column]):
+            known = frame[column].cat.categories
+            new = pd.Index(rows[column].dropna().astype(object).unique()).difference(known)
+            categories = known.append(new) if len(new) else known
+            frame[column] = frame[column].cat.set_categories(categories)
+            rows[column] = pd.Categorical(rows[column], categories=categories)
+    return pd.concat([frame, rows], ignore_index=True)
+
+
+def append(path, rows):
+    """Append `rows` to the store file at `path`.
+
+    The rows are written to a new part file, so an append costs the size of
+    the rows rather than of the table. Every COMPACT_PARTS-th append
+    compacts the table instead.
+    """
+    folded, found = _parts(path)
+    if len([number for number, _ in found if number > folded]) + 1 >= COMPACT_PARTS:
+        compact(path, rows)
+        return
+    part = f"{path[:-len('.feather')]}.{max([folded] + [number for number, _ in found]) + 1}.feather"
+    tmp = f"{part}.{os.getpid()}.tmp"
+    write(rows.reset_index(drop=True), tmp)
+    os.replace(tmp, part)
+
+
+def compact(path, rows=None):
+    """Rewrite the store file at `path` with the rows of its part files (and `rows`) and remove the parts.
+
+    The new file records the parts it holds, so a reader that still finds
+    one of them before it is removed skips it.
+    """
+    folded, found = _parts(path)
+    frame = read(path)
+    if rows is not None:
+        frame = concat(frame, rows)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    write(frame, tmp, folded=max([folded] + [number for number, _ in found]))
+    os.replace(tmp, path)
+    _remove_parts(path)
+
+
+def _read(path, columns):
+    table = feather.read_table(path, columns=columns, memory_map=True)
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def read(path, columns=None):
+    """Memory-map a store file and return the requested columns as a DataFrame.
+
+    Numeric columns without missing values are read-only views of the
+    mapped file; callers copy before mutating, as for every shared frame.
+    Rows appended since the file was written are read from its part files
+    and concatenated, which copies the columns until the next compaction.
+    """
+    frame = _read(path, columns)
+    appended = [_read(part, columns) for part in parts(path)]
+    if appended:
+        frame = concat(frame, functools.reduce(concat, appended))
+    return frame
+
+
+if __name__ == "__main__":
+    import data_loader
+
+    parser = argparse.ArgumentParser(description="Convert the CSV tables to the columnar store")
+    parser.add_argument("--data-dir", default=data_loader.DATA_DIR)
+    args = parser.parse_args()
+
+    for path in convert(args.data_dir, data_loader.DATA_FILES):
+        print(f"wrote {path} ({os.path.getsize(path) / 2**20:.2f} MB)")
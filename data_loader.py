@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+Process-wide data loading for the app.
+
+Each table is parsed once per server process and the resulting frames are
+shared by every Streamlit session. A table is only re-read when its source
+file's mtime changes on disk. The frames are shared, so callers must treat
+them as read-only and .copy() before mutating.
+
+When `python columnar_store.py` has been run, shots and appearances are
+memory-mapped from the typed store instead of parsed from CSV, and
+sections can ask for just the columns they need.
+
+New rows are added with append() (see ingest.py), which writes them to
+disk and extends the cached frames without re-reading the tables. Such
+appends do not change data_version(); the caller invalidates what they
+touched instead.
+
+Structures derived from the frames (indexes, aggregate tables) are shared
+the same way through Shared.
+"""
+
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+
+import columnar_store
+import timings
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DATA_FILES = {
+    "players": "filtered_players.csv",
+    "shots": "shots_modified.csv",
+    "apps": "appearances_modified.csv",
+}
+
+#keep the file's own line endings; the keyword was renamed in pandas 1.5
+_LINE_TERMINATOR = "lineterminator" if tuple(map(int, pd.__version__.split(".")[:2])) >= (1, 5) else "line_terminator"
+
+_cache = {}                 # (name, columns) -> dict(frame, source, mtime, seconds, bytes)
+_versions = {}              # path -> (mtime written by append(), version it stands in for)
+_lock = threading.Lock()
+
+
+def _mtime(path):
+    """Modification time of a source; a store file counts its part files."""
+    return columnar_store.mtime(path) if path.endswith(".feather") else os.path.getmtime(path)
+
+
+def _source(name):
+    """Path to read `name` from: the columnar store if it is up to date, else the CSV."""
+    csv_path = os.path.join(DATA_DIR, DATA_FILES[name])
+    if name in columnar_store.SCHEMAS:
+        store_path = columnar_store.store_path(DATA_DIR, name)
+        if os.path.exists(store_path):
+            if columnar_store.mtime(store_path) >= os.path.getmtime(csv_path):
+                return store_path
+            logger.warning("%s is older than %s, reading the CSV", store_path, csv_path)
+    return csv_path
+
+
+def _read(name, path, columns):
+    if path.endswith(".feather"):
+        return columnar_store.read(path, columns)
+    frame = pd.read_csv(path, usecols=columns)
+    if name in columnar_store.SCHEMAS:
+        frame = columnar_store.coerce(name, frame)
+    return frame
+
+
+def load_table(name, columns=None):
+    """Return the shared frame for `name`, re-reading it only if its source changed."""
+    key = (name, tuple(columns) if columns is not None else None)
+    path = _source(name)
+    mtime = _mtime(path)
+    entry = _cache.get(key)
+    if entry is not None and entry["source"] == path and entry["mtime"] == mtime:
+        return entry["frame"]
+
+    with _lock:
+        entry = _cache.get(key)
+        if entry is not None and entry["source"] == path and entry["mtime"] == mtime:
+            return entry["frame"]
+        start = time.perf_counter()
+        frame = _read(name, path, columns)
+        seconds = time.perf_counter() - start
+        timings.record(f"load.{name}", seconds)
+        nbytes = int(frame.memory_usage(deep=True).sum())
+        _cache[key] = {"frame": frame, "source": path, "mtime": mtime,
+                       "seconds": seconds, "bytes": nbytes}
+        logger.info("loaded %s from %s: %d rows in %.3fs, %.1f MB",
+                    name, os.path.basename(path), len(frame), seconds, nbytes / 2**20)
+        return frame
+
+
+def load_section(section):
+    """Return the table behind `section` with only the columns that section reads."""
+    name, columns = columnar_store.SECTION_COLUMNS[section]
+    return load_table(name, columns)
+
+
+class Shared:
+    """A structure built from source frames and shared by every session.
+
+    get(*sources) returns `build(*sources)`, built once and rebuilt only
+    when a source is not the very frame it was built from: a reloaded or
+    extended frame is a new object, so identity is the source's version.
+    """
+
+    def __init__(self, timer, build):
+        self.timer = timer          # timings stage of a build
+        self.build = build
+        self._entry = None          # (sources, value)
+        self._lock = threading.Lock()
+
+    def _current(self, sources):
+        entry = self._entry
+        if entry is not None and len(entry[0]) == len(sources) and all(a is b for a, b in zip(entry[0], sources)):
+            return entry
+        return None
+
+    def get(self, *sources):
+        entry = self._current(sources)
+        if entry is not None:
+            return entry[1]
+
+        with self._lock:
+            entry = self._current(sources)
+            if entry is None:
+                with timings.timer(self.timer):
+                    entry = (sources, self.build(*sources))
+                self._entry = entry
+            return entry[1]
+
+    def carry(self, old, new, update):
+        """If the value was built from frame `old`, make `update(value)` the value built from `new`,
+        e.g. after rows were appended to `old` (see append())."""
+        with self._lock:
+            entry = self._entry
+            if entry is not None and any(source is old for source in entry[0]):
+                self._entry = (tuple(new if source is old else source for source in entry[0]), update(entry[1]))
+
+
+def load_data():
+    """Return (df_players, df_shots, df_apps) with every column."""
+    return load_table("players"), load_table("shots"), load_table("apps")
+
+
+def load_report():
+    """Load time and memory use of every table currently held in the cache."""
+    with _lock:         # append() and load_table() change the cache concurrently
+        entries = list(_cache.items())
+    rows = []
+    for (name, columns), entry in entries:
+        rows.append({"table": name,
+                     "columns": len(entry["frame"].columns),
+                     "source": os.path.basename(entry["source"]),
+                     "rows": len(entry["frame"]),
+                     "load_s": round(entry["seconds"], 3),
+                     "memory_mb": round(entry["bytes"] / 2**20, 2)})
+    return pd.DataFrame(rows, columns=["table", "columns", "source", "rows", "load_s", "memory_mb"])
+
+
+def _version(path):
+    mtime = _mtime(path)
+    written = _versions.get(path)
+    if written is not None and written[0] == mtime:
+        return written[1]
+    return (os.path.basename(path), mtime)
+
+
+def data_version():
+    """Token that changes whenever a source file of the shots or appearances changes
+    other than through append()."""
+    return tuple(_version(_source(name)) for name in ("shots", "apps"))
+
+
+def append(name, rows):
+    """Append `rows` (already in the table's schema) to table `name` on disk and in memory.
+
+    The rows are added to the CSV and, if it is up to date, the columnar
+    store, and every cached frame of the table is extended in place of a
+    re-read. Returns the (old frame, new frame) pairs that were replaced, so
+    indexes and aggregates over them can be extended as well.
+    """
+    csv_path = os.path.join(DATA_DIR, DATA_FILES[name])
+    with _lock:
+        source = _source(name)
+        mtime = _mtime(source)
+        paths = [csv_path] + ([source] if source != csv_path else [])
+        before = {path: _version(path) for path in paths}
+
+        with open(csv_path, "rb") as f:
+            eol = "\r\n" if f.readline().endswith(b"\r\n") else "\n"
+            f.seek(-1, os.SEEK_END)
+            newline = f.read(1) != b"\n"
+        with open(csv_path, "a", encoding="utf-8", newline="") as f:
+            if newline:
+                f.write(eol)
+            rows.to_csv(f, header=False, index=False, **{_LINE_TERMINATOR: eol})
+        if source != csv_path:
+            columnar_store.append(source, rows)
+        for path in paths:
+            _versions[path] = (_mtime(path), before[path])
+
+        replaced = []
+        for key, entry in list(_cache.items()):
+            if key[0] != name:
+                continue
+            if entry["source"] != source or entry["mtime"] != mtime:
+                del _cache[key]         # already stale, re-read on next use
+                continue
+            columns = list(key[1]) if key[1] is not None else list(entry["frame"].columns)
+            frame = columnar_store.concat(entry["frame"], rows[columns])
+            _cache[key] = dict(entry, frame=frame, mtime=_mtime(source),
+                               bytes=int(frame.memory_usage(deep=True).sum()))
+            replaced.append((entry["frame"], frame))
+        return replaced
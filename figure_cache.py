@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Bounded in-memory cache of rendered figures.
+
+Figures are deterministic functions of the data, so the rendered PNG bytes
+are cached under a key describing what was drawn (figure type, players,
+season, filter) plus the data version. The cache is shared by all sessions,
+bounded in total bytes and evicts the least recently used figure first.
+"""
+
+import threading
+from collections import OrderedDict
+
+import data_loader
+import render_pool
+
+
+class FigureCache:
+    """LRU mapping of key -> PNG bytes, bounded by total size."""
+
+    def __init__(self, max_bytes=128 * 2**20):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            png = self._items.get(key)
+            if png is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return png
+
+    def put(self, key, png):
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.nbytes -= len(old)
+            self._items[key] = png
+            self.nbytes += len(png)
+            while self.nbytes > self.max_bytes and len(self._items) > 1:
+                _, evicted = self._items.popitem(last=False)
+                self.nbytes -= len(evicted)
+
+    def invalidate(self, match):
+        """Drop every entry whose key satisfies `match(key)`; returns how many."""
+        with self._lock:
+            stale = [key for key in self._items if match(key)]
+            for key in stale:
+                self.nbytes -= len(self._items.pop(key))
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.nbytes = 0
+
+    def __len__(self):
+        return len(self._items)
+
+
+_cache = FigureCache()
+
+
+def get_cache():
+    """Process-wide FigureCache shared by every session."""
+    return _cache
+
+
+_pending = {}               # key -> RenderJob of a figure being rendered
+_pending_lock = threading.Lock()
+
+
+def _finish(key, job, future):
+    #a job that invalidate() dropped from _pending, or that a newer job replaced, is not cached
+    with _pending_lock:
+        if _pending.get(key) is not job:
+            return
+        del _pending[key]
+        if not future.cancelled() and future.exception() is None:
+            _cache.put(key, future.result())
+
+
+def submit(kind, params, builder, *args, **kwargs):
+    """RenderJob for the PNG of `figures.<builder>(*args, **kwargs)`, rendered
+    on the render pool (render_pool.py) only on a cache miss.
+
+    `params` is a hashable description of everything the figure depends on
+    besides the data, starting with the player (or tuple of players) and
+    the seasons, e.g. (players, seasons, shotresult). The builder is named
+    rather than passed so it can be sent to a worker process, and
+    sessions asking for a figure already being rendered share its job.
+    Figures a current static report drew (reports.py) are read from disk.
+    """
+    key = (kind, params, data_loader.data_version())
+    png = _cache.get(key)
+    if png is None:
+        #drawn ahead of time by reports.py
+        import reports
+        png = reports.prerendered(kind, params)
+        if png is not None:
+            _cache.put(key, png)
+    if png is not None:
+        return render_pool.RenderJob.completed(png, builder)
+
+    with _pending_lock:
+        job = _pending.get(key)
+        new = job is None
+        if new:
+            job = _pending[key] = render_pool.get_pool().submit(builder, *args, **kwargs)
+    if new:
+        job.add_done_callback(lambda future: _finish(key, job, future))
+    return job
+
+
+def render(kind, params, builder, *args, **kwargs):
+    """PNG bytes of `figures.<builder>(*args, **kwargs)`; see submit()."""
+    return submit(kind, params, builder, *args, **kwargs).result()
+
+
+def invalidate(match):
+    """Drop every figure whose key satisfies `match(key)`, cached or being rendered; returns how many were cached.
+
+    A render of a dropped key is not cached when it completes, so the next
+    request renders it afresh; renders of other keys are unaffected.
+    """
+    with _pending_lock:
+        for key in [key for key in _pending if match(key)]:
+            del _pending[key]
+        return _cache.invalidate(match)
+
+
+def invalidate_players(players, seasons):
+    """Drop the figures of any of `players` in any of `seasons`; returns how many (see invalidate())."""
+    players, seasons = set(players), {int(s) for s in seasons}
+
+    def touched(key):
+        drawn, drawn_seasons = key[1][0], key[1][1]
+        drawn = set(drawn) if isinstance(drawn, tuple) else {drawn}
+        return bool(drawn & players) and bool(set(drawn_seasons) & seasons)
+    return invalidate(touched)
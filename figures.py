@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Matplotlib/mplsoccer figure builders for the comparison page.
+
+Each builder is a plain function of the data it draws and returns a new
+figure, so the page can cache the rendered bytes (see figure_cache.py).
+Importing this module pulls in matplotlib, mplsoccer and seaborn, so the
+page only imports it (through figure_cache) when a figure misses the cache.
+"""
+
+import io
+
+import numpy as np
+import matplotlib.pyplot as plt
+import matplotlib.lines as mlines
+import matplotlib.patches as mpatches
+from mplsoccer import VerticalPitch, Radar
+
+import shot_density
+from analytics import SHOT_RESULT_COLORS
+
+plt.style.use('default')
+
+#fallback ranges when there is no population to take percentiles from
+RADAR_LOW =  [0.0, 0, 0.0, 0.0, 0.0]
+RADAR_HIGH = [1.5, 8, 1.2, 1.5, 0.5]
+
+
+def to_png(fig):
+    """Render `fig` the way st.pyplot does and free it."""
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", bbox_inches="tight", dpi=200)
+    plt.close(fig)
+    return buf.getvalue()
+
+
+def radar_chart(params, names, values, colors, low=None, high=None, ranks=None):
+    """Radar comparison of any number of players; `values` holds one sequence per player.
+
+    `ranks`, one sequence of percentile ranks per player (None where there is
+    none), labels each player's vertices, e.g. p87.
+    """
+    low = np.asarray(RADAR_LOW if low is None else low, dtype=float)
+    high = np.asarray(RADAR_HIGH if high is None else high, dtype=float)
+    high = np.where(high > low, high, low + 0.01)
+    radar = Radar(params,
+                  min_range=low,
+                  max_range=high,
+                  ring_width=1.2)
+
+    fig, ax = radar.setup_axis(figsize=(8, 8),facecolor='None')
+
+    rings_inner = radar.draw_circles(ax=ax, facecolor='None', edgecolor='#fc5f5f')
+    for i, (player_values, color) in enumerate(zip(values, colors)):
+        #outer rings are made invisible so only the filled polygon is drawn
+        radar_poly, rings, vertices = radar.draw_radar(player_values, ax=ax,
+                                                       kwargs_radar={'facecolor': color, 'alpha': 0.6},
+                                                       kwargs_rings={'facecolor': 'None', 'edgecolor': 'None'})
+        ax.scatter(vertices[:, 0], vertices[:, 1],
+                   c=color, edgecolors=color, marker='o', s=150, zorder=2)
+        for (x, y), rank in zip(vertices, ranks[i] if ranks else []):
+            if rank is not None:
+                #beside the vertex, off the axis and its range labels: players alternate sides
+                offset = np.array([-y, x]) / max(np.hypot(x, y), 1e-9) * (-1) ** i * (20 + 14 * (i // 2))
+                ax.annotate(f"p{rank}", (x, y), xytext=tuple(offset), textcoords="offset points",
+                            ha="center", va="center", fontsize=11, fontweight="bold", color=color, zorder=3)
+    param_labels = radar.draw_param_labels(ax=ax, fontsize=15)  # draw the param labels
+    range_labels = radar.draw_range_labels(ax=ax, fontsize=10)  # draw the range labels
+
+    handles = [mpatches.Patch(facecolor=color, alpha=0.6, label=name) for name, color in zip(names, colors)]
+    ax.legend(handles=handles, loc='upper right', bbox_to_anchor=(1.15, 1.05),
+              fontsize=15, frameon=False, labelcolor=colors)
+
+    fig.set_facecolor('none')
+    return fig
+
+
+def _half_pitch():
+    return VerticalPitch(pitch_type = 'custom',
+                         pitch_length=105,
+                         pitch_width= 68,
+                         pitch_color='None',
+                         line_color='#000009',
+                         line_zorder=2,
+                         half=True)
+
+
+def kde_heatmap(x, y, cmap, figsize=(8, 8)):
+    """Shot density of one player on a half pitch (seaborn KDE)."""
+    pitch = _half_pitch()
+    fig, ax = pitch.draw(figsize=figsize)
+    fig.set_facecolor('none')
+
+    pitch.kdeplot(x, y, ax=ax,
+                  # shade using 100 levels so it looks smooth
+                  shade=True, levels=100,
+                  # shade the lowest area so it looks smooth
+                  # so even if there are no events it gets some color
+                  shade_lowest=True,
+                  cut=20,  # extended the cut so it reaches the bottom edge
+                  cmap=cmap)
+    return fig
+
+
+def grid_heatmap(x, y, cmap, figsize=(8, 8)):
+    """Shot density of one player on a half pitch (smoothed grid, see shot_density.py)."""
+    pitch = _half_pitch()
+    fig, ax = pitch.draw(figsize=figsize)
+    fig.set_facecolor('none')
+
+    grid, x_edges, y_edges = shot_density.density(x, y)
+    x_grid, y_grid = np.meshgrid(x_edges, y_edges)
+    cx, cy = np.meshgrid((x_edges[:-1] + x_edges[1:]) / 2, (y_edges[:-1] + y_edges[1:]) / 2)
+    stats = {'statistic': grid, 'x_grid': x_grid, 'y_grid': y_grid, 'cx': cx, 'cy': cy}
+    pitch.heatmap(stats, ax=ax, cmap=cmap, shading='flat', zorder=1)
+    return fig
+
+
+def shots_scatter(shots_list):
+    """Open play shots of each player side by side, coloured by result and sized by xG."""
+    # # Scatter Plot
+    pitch = VerticalPitch(pitch_type = 'custom',
+                  pitch_length=105,
+                  pitch_width=68,
+                  pitch_color='None',
+                  half=True,  # half of a pitch
+                  goal_type='line',
+                  line_color='black')
+
+    fig, axs = pitch.grid(ncols=len(shots_list),figheight=10,
+                          title_height=0.08,
+                          endnote_space=0,
+                          axis=False,
+                          title_space=0,
+                          grid_height=0.85,
+                          endnote_height=0.05)
+    pitch_axes = np.atleast_1d(axs['pitch'])
+
+    #Plotting shots from open play
+    scatters = []
+    for shots, ax in zip(shots_list, pitch_axes):
+        scatters.append(pitch.scatter(shots.positionX, shots.positionY,
+                                      ax=ax,
+                                      c='None',
+                                      marker='o',
+                                      edgecolors=shots['shotResult'].map(SHOT_RESULT_COLORS),
+                                      s=(shots.xGoal* 1900) + 100))
+
+    red_line = mlines.Line2D([], [], color='None', marker='o',
+                              markersize=15,label='Missed Shot',markeredgecolor = 'red')
+    green_line = mlines.Line2D([], [], color='None', marker='o',
+                              markersize=15,label='Saved Shot',markeredgecolor = 'green')
+    blue_line = mlines.Line2D([], [], color='None', marker='o',
+                              markersize=15,label='Shot On Post',markeredgecolor = 'blue')
+    yellow_line = mlines.Line2D([], [], color='None', marker='o',
+                              markersize=15,label='Blocked Shot',markeredgecolor = 'black')
+    goal_line1 = mlines.Line2D([], [], color='None', marker='o',
+                              markersize=15,label='Goal',markeredgecolor = '#b94b75')
+
+
+    fig.legend(handles=[red_line,blue_line,green_line,yellow_line,goal_line1] ,
+               loc='upper right',
+               title="Shot Result",
+               title_fontsize='xx-large',
+               prop={'size': 20})
+
+    fig.legend(*scatters[0].legend_elements("sizes", num=6,func= lambda x: (x-100)/1900),
+               loc='upper left',
+               title="xG",
+               title_fontsize='xx-large',
+               prop={'size': 20})
+
+
+    fig.set_facecolor('None')
+    fig.suptitle("Shot Results (colour) from Open Play with xG (size)",c="black", fontsize=40)
+    return fig
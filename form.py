@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Rolling N-match form of every player.
+
+The appearances are sorted once by player and season, keeping the file's
+order within a season (matches are appended as they are played), and the
+goals, xG and minutes are turned into running totals. A player's matches
+over any season range are then one contiguous slice, and the sum over any
+window of it is the difference of two running totals, so rolling windows
+of any length for any number of players cost O(matches returned) with no
+pandas rolling or groupby per request.
+
+The table is built once per loaded appearances frame and shared across
+sessions like the aggregates.
+"""
+
+import numpy as np
+import pandas as pd
+
+import data_loader
+
+#form column -> appearances column it sums
+SUMS = {"Goals": "goals", "xGoals": "xGoals", "Minutes": "time"}
+COLUMNS = ["PlayerName", "match", "season", "Goals", "xGoals", "xG90", "GoalsPerxG"]
+DEFAULT_WINDOW = 5
+
+
+class FormTable:
+    """Running totals of the appearances, player by player."""
+
+    def __init__(self, apps):
+        names = apps["PlayerName"]
+        codes = names.cat.codes.to_numpy() if pd.api.types.is_categorical_dtype(names) else pd.factorize(names)[0]
+        seasons = apps["season"].to_numpy().astype(np.int64)
+        #lexsort is stable, so matches keep their file order within a season
+        order = np.lexsort((seasons, codes))
+        codes, self.seasons = codes[order], seasons[order]
+        #running totals with a leading 0: the sum of rows [a, b) is cum[b] - cum[a]
+        self.cum = {column: np.r_[0.0, np.cumsum(apps[source].to_numpy(dtype=float)[order])]
+                    for column, source in SUMS.items()}
+
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else np.array([], dtype=int)
+        stops = np.r_[starts[1:], len(codes)]
+        labels = names.cat.categories if pd.api.types.is_categorical_dtype(names) else pd.factorize(names)[1]
+        self._rows = {str(labels[codes[start]]): (int(start), int(stop))
+                      for start, stop in zip(starts, stops) if codes[start] >= 0}
+
+    def rows(self, player, seasons):
+        """[start, stop) of the player's matches in the seasons from min(seasons) to max(seasons)."""
+        start, stop = self._rows.get(player, (0, 0))
+        if not len(seasons) or start == stop:
+            return 0, 0
+        player_seasons = self.seasons[start:stop]
+        return (start + int(np.searchsorted(player_seasons, min(int(s) for s in seasons), "left")),
+                start + int(np.searchsorted(player_seasons, max(int(s) for s in seasons), "right")))
+
+    def rolling(self, players, seasons, window=DEFAULT_WINDOW):
+        """Goals, xG, xG per 90 and goals/xG over every `window` consecutive matches of each player.
+
+        One row per window, labelled by its last match (1 = the player's
+        first match in `seasons`) and that match's season; players with
+        fewer than `window` matches in `seasons` have no rows.
+        """
+        window = max(int(window), 1)
+        spans = [(player,) + self.rows(player, seasons) for player in players]
+        spans = [(player, start, stop) for player, start, stop in spans if stop - start >= window]
+        if not spans:
+            return pd.DataFrame(columns=COLUMNS)
+        #the last row of every window of every player, in one array
+        ends = np.concatenate([np.arange(start + window, stop + 1) for _, start, stop in spans])
+        counts = [stop - start - window + 1 for _, start, stop in spans]
+        firsts = np.repeat([start for _, start, _ in spans], counts)
+        totals = {column: cum[ends] - cum[ends - window] for column, cum in self.cum.items()}
+        with np.errstate(divide="ignore", invalid="ignore"):
+            xg90 = np.where(totals["Minutes"] > 0, totals["xGoals"] / totals["Minutes"] * 90, np.nan)
+            per_xg = np.where(totals["xGoals"] > 0, totals["Goals"] / totals["xGoals"], np.nan)
+        return pd.DataFrame({"PlayerName": np.repeat([player for player, _, _ in spans], counts),
+                             "match": ends - firsts,
+                             "season": self.seasons[ends - 1],
+                             "Goals": totals["Goals"].round().astype(np.int64), "xGoals": totals["xGoals"],
+                             "xG90": xg90, "GoalsPerxG": per_xg}, columns=COLUMNS)
+
+
+_table = data_loader.Shared("form.build", FormTable)
+
+
+def get_table():
+    """Return the shared form table, rebuilding it if the appearances reloaded or grew."""
+    return _table.get(data_loader.load_section("player_seasons"))
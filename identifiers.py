@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Shared dictionary of player IDs and display names.
+
+Shots identify players by shooterID/assisterID and the roster
+(filtered_players.csv) by playerID, so the shot indexes, the partitions
+and the assist network are keyed by those integers and never hold a name.
+Names are resolved here, at the edges: a name selected on the page becomes
+its IDs on the way in (a name stands for all of its IDs, as several
+players share one) and IDs become names again only for display.
+
+The dictionary is built once per loaded table from the distinct (ID, name)
+pairs of the roster and of every league's shots (the shots table and the
+pairs of each shot partition, see shot_partitions.sections), with the
+roster's names taking precedence, and shared across sessions like the
+frames it comes from.
+"""
+
+import numpy as np
+import pandas as pd
+
+import data_loader
+import shot_partitions
+
+
+def pairs(shots):
+    """Distinct (id, name) pairs of the shooters and assisters of `shots` (section "identifiers")."""
+    return pd.concat([shots[[id_column, name_column]].dropna().drop_duplicates().set_axis(["id", "name"], axis=1)
+                      for id_column, name_column in (("shooterID", "shooterName"), ("assisterID", "assisterName"))],
+                     ignore_index=True)
+
+
+class PlayerDictionary:
+    """Sorted player IDs with the name of each; names are kept as codes into `categories`."""
+
+    def __init__(self, roster, *shot_pairs):
+        #first pair per ID wins, so the roster's spelling is the one shown
+        pairs = [roster[["playerID", "Player Name"]].set_axis(["id", "name"], axis=1)] + list(shot_pairs)
+        pairs = pd.concat(pairs, ignore_index=True).astype({"name": str})
+        pairs["id"] = pairs["id"].astype(np.int64)
+        pairs = pairs.drop_duplicates("id").sort_values("id")
+
+        self.ids = pairs["id"].to_numpy()
+        self.codes, self.categories = pd.factorize(pairs["name"])
+        self._by_name = {name: self.ids[self.codes == code] for code, name in enumerate(self.categories)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def player_ids(self, player):
+        """Every ID that goes by the name `player` (empty if the name is unknown)."""
+        return self._by_name.get(player, np.array([], dtype=np.int64))
+
+    def names(self, ids):
+        """Categorical of the names of `ids`; NaN or unknown IDs give NaN."""
+        ids = np.asarray(ids, dtype=float)
+        known = np.isin(ids, self.ids)      # NaN is never in self.ids
+        pos = np.searchsorted(self.ids, np.where(known, ids, 0).astype(np.int64))
+        return pd.Categorical.from_codes(np.where(known, self.codes[np.where(known, pos, 0)], -1),
+                                         categories=self.categories)
+
+    def name(self, player_id):
+        """Name of one ID, or None."""
+        name = self.names([player_id])[0]
+        return None if pd.isna(name) else name
+
+
+def _build(roster, partitions, table):
+    return PlayerDictionary(roster, *[frame for frame in (partitions, table if table is None else pairs(table))
+                                      if frame is not None])
+
+
+_dictionary = data_loader.Shared("identifiers.build", _build)
+
+
+def get_dictionary():
+    """Return the shared dictionary, rebuilding it if the roster or the shots reloaded."""
+    return _dictionary.get(data_loader.load_table("players"), *shot_partitions.sections("identifiers", pairs))
+
+
+def player_ids(players):
+    """IDs of every player in `players`, in order."""
+    dictionary = get_dictionary()
+    ids = [dictionary.player_ids(player) for player in players]
+    return np.concatenate(ids) if ids else np.array([], dtype=np.int64)
+
+
+def with_names(frame, columns=(("shooterID", "shooterName"),)):
+    """`frame` with a name column for each (ID column, name column) pair, for display."""
+    dictionary = get_dictionary()
+    return frame.assign(**{name: dictionary.names(frame[id_column].to_numpy())
+                           for id_column, name in columns})
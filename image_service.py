@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""
+Player image service.
+
+Resolves a player's Wikipedia lead image through the MediaWiki API, fetches
+it over a pooled HTTP session with a timeout and stores a resized thumbnail
+in a content-addressed disk cache (objects/<sha256>.png plus an index.json
+mapping player name -> object). The cache is bounded in bytes and evicts
+the least recently used objects first. Several players are fetched
+concurrently on a thread pool, and a placeholder is served whenever a
+lookup fails, so the page never blocks on or breaks because of the network.
+
+Everything is written to per-object files with atomic renames, so
+concurrent sessions never overwrite each other's images. The index is
+re-read from disk on a miss, and every change to it is merged into the
+index on disk under a lock file, so several servers and prefetch_images.py
+can share one cache without dropping each other's entries. requests and PIL
+are only imported once the network or an image decode is actually needed,
+so serving from a warm cache costs neither import.
+"""
+
+import contextlib
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import timings
+
+try:
+    import fcntl
+except ImportError:             # Windows: the index is only locked against this process's threads
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+WIKI_API = "https://en.wikipedia.org/w/api.php"
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "image_cache")
+THUMBNAIL_SIZE = (1000, 1000)
+PLACEHOLDER_COLOR = "#AFBCD6"
+
+
+def _atomic_write(path, data):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class ImageService:
+    """Fetch, resize and cache player images.
+
+    `api_url` can point at a local stub of the MediaWiki API for testing.
+    With `offline=True` only the cache is consulted (see prefetch_images.py).
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, api_url=WIKI_API, timeout=5.0,
+                 max_bytes=256 * 2**20, workers=8, retry_after=300.0, offline=False):
+        self.cache_dir = cache_dir
+        self.api_url = api_url
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.retry_after = retry_after
+        self.offline = offline
+        self.workers = workers
+
+        self._session = None
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="player-image")
+
+        self._lock = threading.Lock()
+        self._failures = {}             # name -> time of the last failed lookup
+        os.makedirs(os.path.join(cache_dir, "objects"), exist_ok=True)
+        self._index = {}
+        self._index_mtime = None        # of the index.json self._index was read from
+        self._reload()
+        self.placeholder = self._make_placeholder()
+
+    ##################################Disk cache#############################
+    def _index_path(self):
+        return os.path.join(self.cache_dir, "index.json")
+
+    def _object_path(self, digest):
+        return os.path.join(self.cache_dir, "objects", f"{digest}.png")
+
+    def _read_index(self):
+        try:
+            with open(self._index_path()) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _reload(self):
+        """Re-read the index if it changed on disk, e.g. written by another process."""
+        try:
+            mtime = os.stat(self._index_path()).st_mtime_ns
+        except OSError:
+            return
+        if mtime != self._index_mtime:
+            self._index_mtime = mtime
+            self._index = self._read_index()
+
+    @contextlib.contextmanager
+    def _index_lock(self):
+        """Hold the index against other threads and, where fcntl exists, other processes."""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self._index_path() + ".lock", "a") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _write_index(self, index):
+        """Replace the index on disk and in memory; hold _index_lock() and start from _read_index()."""
+        _atomic_write(self._index_path(), json.dumps(index, indent=1).encode())
+        self._index = index
+        self._index_mtime = os.stat(self._index_path()).st_mtime_ns
+
+    def _lookup(self, name):
+        entry = self._index.get(name)
+        if entry is None:
+            #stored since by another process (prefetch_images.py, another server)?
+            self._reload()
+            entry = self._index.get(name)
+        return entry
+
+    def _make_placeholder(self):
+        path = os.path.join(self.cache_dir, "placeholder.png")
+        if not os.path.exists(path):
+            from PIL import Image
+
+            buf = io.BytesIO()
+            Image.new("RGB", THUMBNAIL_SIZE, PLACEHOLDER_COLOR).save(buf, format="PNG")
+            _atomic_write(path, buf.getvalue())
+        return path
+
+    def cached(self, name):
+        """Path of the cached thumbnail for `name`, or None. Marks it as recently used."""
+        entry = self._lookup(name)
+        if entry is None:
+            return None
+        path = self._object_path(entry["sha256"])
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def entry(self, name):
+        """Index entry (sha256 and source url) of a cached player, or {}."""
+        return dict(self._lookup(name) or {})
+
+    def store(self, name, data, url=None):
+        """Resize raw image bytes, store them by content hash and index them under `name`."""
+        from PIL import Image
+
+        image = Image.open(io.BytesIO(data)).convert("RGB")
+        image = image.resize(THUMBNAIL_SIZE, Image.LANCZOS)
+        buf = io.BytesIO()
+        image.save(buf, format="PNG")
+        png = buf.getvalue()
+
+        digest = hashlib.sha256(png).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            _atomic_write(path, png)
+        with self._index_lock():
+            index = self._read_index()
+            index[name] = {"sha256": digest, "url": url}
+            self._write_index(index)
+        self.evict()
+        return path
+
+    def evict(self):
+        """Delete least recently used objects until the cache fits in max_bytes."""
+        objects_dir = os.path.join(self.cache_dir, "objects")
+        with self._index_lock():
+            files = []
+            for entry in os.scandir(objects_dir):
+                if entry.name.endswith(".png"):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path, entry.name[:-4]))
+            total = sum(size for _, size, _, _ in files)
+            evicted = set()
+            for _, size, path, digest in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                os.remove(path)
+                total -= size
+                evicted.add(digest)
+            if evicted:
+                index = self._read_index()
+                self._write_index({n: e for n, e in index.items() if e["sha256"] not in evicted})
+
+    ##################################Network#############################
+    @property
+    def session(self):
+        """Pooled requests session, created on first use."""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=self.workers, pool_maxsize=self.workers)
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    session.headers["User-Agent"] = "SportsAnalytics/1.0 (player comparison app)"
+                    self._session = session
+        return self._session
+
+    def resolve(self, name):
+        """URL of the lead image of the best Wikipedia search hit for `name`."""
+        params = {"action": "query", "format": "json", "redirects": 1,
+                  "generator": "search", "gsrsearch": name, "gsrlimit": 1,
+                  "prop": "pageimages", "piprop": "original"}
+        response = self.session.get(self.api_url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        pages = response.json()["query"]["pages"]
+        return list(pages.values())[0]["original"]["source"]
+
+    def download(self, url):
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        return response.content
+
+    def refresh(self, name):
+        """Look `name` up on the network and store it; raises on any failure."""
+        with timings.timer("image.fetch"):
+            url = self.resolve(name)
+            return self.store(name, self.download(url), url)
+
+    def fetch(self, name):
+        """Path of the thumbnail for `name`, fetching it on a cache miss.
+
+        Returns the placeholder if the lookup fails (or misses while
+        offline); failures are retried after `retry_after` seconds.
+        """
+        path = self.cached(name)
+        if path is not None:
+            return path
+        if self.offline:
+            return self.placeholder
+        failed_at = self._failures.get(name)
+        if failed_at is not None and time.monotonic() - failed_at < self.retry_after:
+            return self.placeholder
+        try:
+            path = self.refresh(name)
+        except Exception as exc:
+            logger.warning("image lookup for %r failed: %s", name, exc)
+            self._failures[name] = time.monotonic()
+            return self.placeholder
+        self._failures.pop(name, None)
+        return path
+
+    def fetch_many(self, names):
+        """Fetch several players concurrently; returns {name: path}."""
+        names = list(dict.fromkeys(names))
+        with timings.timer("image.fetch_many"):
+            return dict(zip(names, self._executor.map(self.fetch, names)))
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_service():
+    """Process-wide ImageService shared by every session.
+
+    Set PLAYER_IMAGES_OFFLINE=1 to serve only prefetched images.
+    """
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = ImageService(offline=os.environ.get("PLAYER_IMAGES_OFFLINE") == "1")
+        return _service
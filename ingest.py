@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+Incremental ingestion of new matches.
+
+    python ingest.py --shots matchweek_shots.csv --apps matchweek_apps.csv
+
+New shots and appearances are validated against the table schemas
+(columnar_store.SCHEMAS) and the rows already loaded, appended to the CSVs
+and the columnar store, and folded into the shared frames, player indexes
+and player-season aggregates in place (and, once built, the shot
+partitions of shot_partitions.py), so a running server picks up a
+matchweek without a restart or a full recompute. Only the cached figures
+of the players and seasons the new rows touch are dropped.
+
+Shots may carry a league column; shots without one take the league of
+their clubs (clubs.py). Shots of the shots table's leagues
+(shot_partitions.TABLE_LEAGUES) go to the tables, and to their partitions
+once the table is partitioned; shots of any other league go to that
+league's partitions only, which must have been built.
+
+A running app ingests the CSVs dropped into incoming/ (named *_shots.csv
+or *_apps.csv) on its next rerun, and analytics_service.py takes the same
+rows as JSON on POST /ingest. Running this script next to a live server
+works as well, but that server then re-reads the tables in full.
+"""
+
+import argparse
+import glob
+import logging
+import os
+import sys
+import threading
+
+import pandas as pd
+
+import aggregates
+import clubs
+import columnar_store
+import data_loader
+import figure_cache
+import identifiers
+import player_index
+import shot_partitions
+import timings
+
+logger = logging.getLogger(__name__)
+
+#columns that may be empty (unassisted shots, shots without a lastAction)
+NULLABLE = {"shots": {"assisterName", "assisterID", "lastAction"}, "apps": set()}
+#rows whose key is already in the table are rejected; a game's shots arrive together
+KEYS = {"shots": ["gameID"], "apps": ["season", "PlayerName", "HomeTeam", "AwayTeam"]}
+DOMAINS = {
+    "situation": {"OpenPlay", "FromCorner", "SetPiece", "DirectFreekick", "Penalty"},
+    "shotType": {"LeftFoot", "RightFoot", "Head", "OtherBodyPart"},
+    "shotResult": {"Goal", "SavedShot", "MissedShots", "BlockedShot", "ShotOnPost", "OwnGoal"},
+}
+RANGES = {
+    "positionX": (0, 1), "positionY": (0, 1), "xGoal": (0, 1), "minute": (0, 130), "time": (0, 130),
+    "goals": (0, None), "shots": (0, None), "assists": (0, None), "keyPasses": (0, None),
+    "xGoals": (0, None), "xGoalsChain": (0, None), "xGoalsBuildup": (0, None), "xAssists": (0, None),
+}
+
+
+def _keys(frame, keys):
+    return pd.MultiIndex.from_arrays([frame[k].astype(str) if pd.api.types.is_categorical_dtype(frame[k])
+                                      else frame[k] for k in keys])
+
+
+def _distinct(frame):
+    return frame.drop_duplicates()
+
+
+def _check_names(rows):
+    """Raise ValueError if a shot gives a known player ID another name; IDs are what the indexes key on."""
+    dictionary = identifiers.get_dictionary()
+    for id_column, name_column in (("shooterID", "shooterName"), ("assisterID", "assisterName")):
+        known = pd.Series(dictionary.names(rows[id_column].to_numpy()), dtype=object)
+        names = rows[name_column].astype(object)
+        clash = known.notna() & names.notna() & (known != names)
+        if clash.any():
+            first = clash.idxmax()
+            raise ValueError(f"shots: {id_column} {int(rows[id_column][first])} is {known[first]}, "
+                             f"not {names[first]}")
+
+
+def _leagues(rows, leagues):
+    """League of each shot of `rows`, that of its clubs without a league column; raises ValueError."""
+    if leagues is None:
+        return clubs.leagues(rows["HomeTeam"], rows["AwayTeam"])
+    if leagues.isna().any():
+        raise ValueError("shots: empty values in league")
+    leagues = leagues.astype(str).to_numpy()
+    unknown = {league for league in set(leagues) - set(shot_partitions.TABLE_LEAGUES)
+               if not shot_partitions.available(league)}
+    if unknown:
+        raise ValueError(f"shots: no partitions for league {', '.join(sorted(unknown))}, "
+                         f"build them with shot_partitions.py first")
+    return leagues
+
+
+def validate(name, rows):
+    """`rows` checked against table `name` and cast to its schema; raises ValueError.
+
+    Shots keep a league column (see _leagues).
+    """
+    schema = columnar_store.SCHEMAS[name]
+    missing = [c for c in schema if c not in rows.columns]
+    if missing:
+        raise ValueError(f"{name}: missing columns {', '.join(missing)}")
+    leagues = rows["league"].reset_index(drop=True) if name == "shots" and "league" in rows.columns else None
+    rows = rows[list(schema)].reset_index(drop=True)
+
+    empty = [c for c in schema if c not in NULLABLE[name] and rows[c].isna().any()]
+    if empty:
+        raise ValueError(f"{name}: empty values in {', '.join(empty)}")
+    for column, dtype in schema.items():
+        if dtype == "category":
+            continue
+        values = pd.to_numeric(rows[column], errors="coerce")
+        if (values.isna() & rows[column].notna()).any() or (dtype.startswith("int") and (values % 1 != 0).any()):
+            raise ValueError(f"{name}: {column} must be {'whole numbers' if dtype.startswith('int') else 'numbers'}")
+        low, high = RANGES.get(column, (None, None))
+        if (low is not None and (values < low).any()) or (high is not None and (values > high).any()):
+            raise ValueError(f"{name}: {column} out of range [{low}, {high if high is not None else ''}]")
+    for column, allowed in DOMAINS.items():
+        if column in rows and not set(rows[column].dropna()) <= allowed:
+            raise ValueError(f"{name}: unknown {column} {sorted(set(rows[column].dropna()) - allowed)}")
+
+    rows = columnar_store.coerce(name, rows)
+    if name == "shots":
+        rows["league"] = _leagues(rows, leagues)
+        _check_names(rows)
+    new_keys = _keys(rows, KEYS[name])
+    if name == "apps" and new_keys.duplicated().any():
+        raise ValueError(f"{name}: the same player appears twice in a match")
+    clash = new_keys.isin(_keys(data_loader.load_table(name, KEYS[name]), KEYS[name]))
+    if name == "shots" and shot_partitions.leagues():
+        #only the distinct games of each partition are read and kept
+        games = shot_partitions.summary(KEYS[name], _distinct, shot_partitions.leagues())
+        clash |= new_keys.isin(_keys(games, KEYS[name]))
+    if clash.any():
+        raise ValueError(f"{name}: already ingested: {', '.join(map(str, new_keys[clash].unique()[:5]))}")
+    return rows
+
+
+def _touched(batches):
+    players, seasons = set(), set()
+    for name, rows in batches.items():
+        for column in ("shooterName", "assisterName") if name == "shots" else ("PlayerName",):
+            players.update(rows[column].dropna().astype(str))
+        seasons.update(int(s) for s in rows["season"].unique())
+    return players, seasons
+
+
+_lock = threading.Lock()
+
+
+def append(shots=None, apps=None):
+    """Validate and ingest new shots and/or appearances; returns a summary.
+
+    Nothing is written unless every batch is valid.
+    """
+    with _lock, timings.timer("ingest.append"):
+        batches = {name: validate(name, rows) for name, rows in (("shots", shots), ("apps", apps))
+                   if rows is not None}
+        batches = {name: rows for name, rows in batches.items() if len(rows)}
+        partitioned = shot_partitions.table_partitioned()
+        for name, rows in batches.items():
+            table_rows = rows
+            if name == "shots":
+                #the tables hold TABLE_LEAGUES; shots of other leagues only go to their partitions
+                in_table = rows["league"].isin(shot_partitions.TABLE_LEAGUES)
+                table_rows = rows[in_table].drop(columns="league")
+                rows = rows if partitioned else rows[~in_table]
+            if len(table_rows):
+                replaced = data_loader.append(name, table_rows)
+                player_index.extend(replaced)
+                aggregates.extend(replaced)
+            if name == "shots":
+                #after the tables, so the table's partitions stay newer than the shots CSV
+                if len(rows):
+                    shot_partitions.append(rows)
+                if partitioned and len(table_rows):
+                    shot_partitions.touch(shot_partitions.TABLE_LEAGUES)
+        players, seasons = _touched(batches)
+        dropped = figure_cache.invalidate_players(players, seasons)
+        #radar ranges and ranks are percentiles over everyone in the season
+        dropped += figure_cache.invalidate(
+            lambda key: key[0] == "radar" and bool({int(s) for s in key[1][1]} & seasons))
+    logger.info("ingested %s; %d cached figures dropped",
+                ", ".join(f"{len(rows)} {name}" for name, rows in batches.items()) or "nothing", dropped)
+    return {"rows": {name: len(rows) for name, rows in batches.items()},
+            "players": sorted(players), "seasons": sorted(seasons), "figures_dropped": dropped}
+
+
+_poll_lock = threading.Lock()
+
+
+def poll(directory=None):
+    """Ingest every *_shots.csv / *_apps.csv in `directory` (default incoming/).
+
+    Files are moved to done/ or, if invalid, rejected/ next to them.
+    Returns the summaries of the ingested files.
+    """
+    directory = directory or os.path.join(data_loader.DATA_DIR, "incoming")
+    if not os.path.isdir(directory) or not _poll_lock.acquire(blocking=False):
+        return []
+    try:
+        results = []
+        for path in sorted(glob.glob(os.path.join(directory, "*.csv"))):
+            name = "shots" if path.endswith("_shots.csv") else "apps" if path.endswith("_apps.csv") else None
+            if name is None:
+                continue
+            try:
+                results.append(append(**{name: pd.read_csv(path)}))
+                target = "done"
+            except ValueError as exc:
+                logger.warning("rejected %s: %s", path, exc)
+                target = "rejected"
+            os.makedirs(os.path.join(directory, target), exist_ok=True)
+            os.replace(path, os.path.join(directory, target, os.path.basename(path)))
+        return results
+    finally:
+        _poll_lock.release()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Append new shots and appearances to the tables")
+    parser.add_argument("--shots", help="CSV of new shots, same columns as shots_modified.csv")
+    parser.add_argument("--apps", help="CSV of new appearances, same columns as appearances_modified.csv")
+    args = parser.parse_args()
+    if not (args.shots or args.apps):
+        parser.error("nothing to ingest, pass --shots and/or --apps")
+
+    try:
+        summary = append(shots=pd.read_csv(args.shots) if args.shots else None,
+                         apps=pd.read_csv(args.apps) if args.apps else None)
+    except ValueError as exc:
+        sys.exit(f"rejected: {exc}")
+    print(f"ingested {summary['rows']} for {len(summary['players'])} players in seasons {summary['seasons']}")
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+League-wide leaderboards over precomputed player-season metrics.
+
+Every player-season of the aggregate table becomes one row of a metric
+matrix: the aggregate totals and per-90 rates plus derived metrics
+(goals minus xG, shot conversion), the minutes played and a position
+group, the group of positionOrder in which the player spent most of the
+season's minutes (understat numbering: 1 goalkeeper ... 16 left forward,
+17 substitute). Rows are sorted by season, so a season is a slice, and a
+leaderboard query is a mask over that slice and an np.argpartition top-k,
+with no sort of the whole league.
+
+The matrix is rebuilt whenever the aggregate table or the appearances
+change.
+"""
+
+import numpy as np
+import pandas as pd
+
+import aggregates
+import data_loader
+
+#position group -> positionOrder range (inclusive)
+POSITION_GROUPS = {
+    "GK": (1, 1),
+    "DF": (2, 4),
+    "DM": (5, 7),
+    "MF": (8, 10),
+    "AM": (11, 13),
+    "FW": (14, 16),
+    "Sub": (17, 17),
+}
+
+#leaderboard metric -> aggregate column (None: derived below)
+METRICS = {
+    "xG90": "xG90",
+    "Goals90": "Goals90",
+    "xA90": "xA90",
+    "Shots90": "Shots90",
+    "xC90": "xC90",
+    "xB90": "xB90",
+    "Goals": "Goals",
+    "xGoals": "xGoals",
+    "Assists": "Assists",
+    "xAssists": "xAssists",
+    "GoalsMinusxG": None,
+    "Conversion": None,       # goals per shot
+}
+COLUMNS = ["rank", "PlayerName", "season", "position", "Minutes", "value"]
+
+
+def position_groups(apps):
+    """Position group of every (PlayerName, season) in `apps`: where most of the minutes were played,
+    substitute appearances only counting for players who never started."""
+    orders = apps["positionOrder"].to_numpy()
+    group = pd.cut(orders, [low - 0.5 for low, _ in POSITION_GROUPS.values()] + [np.inf],
+                   labels=list(POSITION_GROUPS)).astype(str)
+    played = pd.DataFrame({"PlayerName": apps["PlayerName"].astype(str).to_numpy(),
+                           "season": apps["season"].to_numpy().astype(np.int64),
+                           "position": group, "minutes": apps["time"].to_numpy(dtype=float)})
+    played = played.groupby(["PlayerName", "season", "position"], sort=False)["minutes"].sum().reset_index()
+    played = played.assign(sub=played["position"] == "Sub").sort_values(["sub", "minutes"], ascending=[True, False],
+                                                                         kind="mergesort")
+    return played.drop_duplicates(["PlayerName", "season"]).set_index(["PlayerName", "season"])["position"]
+
+
+class Leaderboard:
+    """Metric matrix of every player-season, sliced by season."""
+
+    def __init__(self, table, positions):
+        table = table.sort_index(level="season", kind="mergesort", sort_remaining=False)
+        self.names = table.index.get_level_values("PlayerName").to_numpy()
+        self.seasons = table.index.get_level_values("season").to_numpy().astype(np.int64)
+        self.minutes = table["Minutes"].to_numpy(dtype=float)
+        self.positions = positions.reindex(table.index).fillna("").to_numpy(dtype=object)
+
+        goals = table["Goals"].to_numpy(dtype=float)
+        shots = table["Shots"].to_numpy(dtype=float)
+        derived = {"GoalsMinusxG": goals - table["xGoals"].to_numpy(dtype=float)}
+        with np.errstate(divide="ignore", invalid="ignore"):
+            derived["Conversion"] = np.where(shots > 0, goals / shots, np.nan)
+        self.values = np.column_stack([table[column].to_numpy(dtype=float) if column else derived[metric]
+                                       for metric, column in METRICS.items()])
+        self.metrics = {metric: i for i, metric in enumerate(METRICS)}
+
+        season_list, starts = np.unique(self.seasons, return_index=True)
+        stops = np.r_[starts[1:], len(self.seasons)]
+        self._slices = {int(s): (int(a), int(b)) for s, a, b in zip(season_list, starts, stops)}
+
+    def top(self, metric, seasons, n=10, min_minutes=aggregates.MIN_MINUTES, positions=None, ascending=False):
+        """The `n` best player-seasons of `seasons` by `metric` (lowest first if `ascending`).
+
+        Only player-seasons with at least `min_minutes` and, if given, a
+        position group in `positions` are ranked; raises ValueError for an
+        unknown metric.
+        """
+        if metric not in self.metrics:
+            raise ValueError(f"unknown metric {metric}; one of {', '.join(self.metrics)}")
+        rows = [np.arange(*self._slices[int(s)]) for s in seasons if int(s) in self._slices]
+        rows = np.concatenate(rows) if rows else np.array([], dtype=np.int64)
+        values = self.values[rows, self.metrics[metric]]
+        keep = (self.minutes[rows] >= min_minutes) & ~np.isnan(values)
+        if positions:
+            keep &= np.isin(self.positions[rows], list(positions))
+        rows, values = rows[keep], values[keep]
+
+        score = values if ascending else -values
+        n = max(int(n), 0)
+        best = np.argpartition(score, n)[:n] if len(score) > n else np.arange(len(score))
+        #ties are listed by name, then season
+        best = best[np.lexsort((self.seasons[rows[best]], self.names[rows[best]], score[best]))]
+        rows = rows[best]
+        return pd.DataFrame({"rank": np.arange(1, len(rows) + 1),
+                             "PlayerName": self.names[rows],
+                             "season": self.seasons[rows],
+                             "position": self.positions[rows],
+                             "Minutes": self.minutes[rows].astype(np.int64),
+                             "value": values[best]}, columns=COLUMNS)
+
+
+_board = data_loader.Shared("leaderboard.build", lambda table, apps: Leaderboard(table, position_groups(apps)))
+
+
+def get_board():
+    """Return the shared leaderboard, rebuilding it if the aggregates or the appearances changed."""
+    return _board.get(aggregates.get_table(), data_loader.load_section("positions"))
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+Population percentiles of the radar metrics.
+
+The per-90 radar metrics of every player-season with at least
+aggregates.MIN_MINUTES played are summarised, per season, as a lookup
+table of their 0th..100th percentiles. The radar's ranges are the 5th and
+95th percentiles of the selected seasons, so one outlier no longer squashes
+everyone else and the scales mean the same across seasons, and a player's
+percentile rank is an interpolation into the same table, independent of
+the size of the league.
+
+Tables are built once per aggregate table; a season range other than a
+single season is computed on first use and kept.
+"""
+
+import numpy as np
+
+import aggregates
+import data_loader
+
+METRICS = aggregates.RADAR_METRICS
+KNOTS = np.arange(101)              # percentiles kept per metric
+RANGE = (5, 95)                     # percentiles used as the radar's low and high
+
+
+class PercentileTable:
+    """Percentile knots of the radar metrics per season (and per season range on demand)."""
+
+    def __init__(self, table, min_minutes=aggregates.MIN_MINUTES):
+        profiled = table[table["Minutes"] >= min_minutes].dropna(subset=METRICS)
+        seasons = profiled.index.get_level_values("season")
+        self._values = {int(s): profiled.loc[seasons == s, METRICS].to_numpy(dtype=float)
+                        for s in seasons.unique()}
+        self._knots = {}
+        for season in self._values:
+            self.knots([season])
+
+    def knots(self, seasons):
+        """(101, metrics) array of the 0th..100th percentiles over `seasons`; NaN without data."""
+        key = tuple(sorted({int(s) for s in seasons}))
+        knots = self._knots.get(key)
+        if knots is None:
+            values = [self._values[s] for s in key if s in self._values]
+            values = np.concatenate(values) if values else np.empty((0, len(METRICS)))
+            knots = np.percentile(values, KNOTS, axis=0) if len(values) else np.full((len(KNOTS), len(METRICS)), np.nan)
+            self._knots[key] = knots
+        return knots
+
+    def ranges(self, seasons):
+        """(low, high) radar range per metric over `seasons`."""
+        knots = self.knots(seasons)
+        return knots[RANGE[0]], knots[RANGE[1]]
+
+    def ranks(self, values, seasons):
+        """Percentile rank (0-100) of each row of `values` (players x metrics) within `seasons`."""
+        knots = self.knots(seasons)
+        values = np.atleast_2d(np.asarray(values, dtype=float))
+        ranks = np.full(values.shape, np.nan)
+        for m in range(len(METRICS)):
+            if not np.isnan(knots[:, m]).any():
+                ranks[:, m] = np.interp(values[:, m], knots[:, m], KNOTS)
+        return np.where(np.isnan(values), np.nan, ranks)
+
+
+_table = data_loader.Shared("percentiles.build", PercentileTable)
+
+
+def get_table():
+    """Return the shared percentile table, rebuilding it if the aggregate table changed."""
+    return _table.get(aggregates.get_table())
+
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Pre-built lookup indexes over the shared shots and appearances tables.
+
+An index keeps a copy of its table sorted by the key columns together
+with the (start, stop) offsets of every key prefix, so pulling out one
+player's rows is an O(k) slice instead of an O(N) boolean scan. Indexes
+are built once per loaded frame and shared across sessions like the
+frames themselves. Rows appended to a frame (see ingest.py) get a small
+index of their own instead of a re-sort of the whole table.
+"""
+
+import copy
+
+import numpy as np
+import pandas as pd
+
+import data_loader
+
+#section -> name -> key columns (rows for any prefix of the key are contiguous)
+INDEXES = {
+    "shot_maps": {"shooter": ("shooterID", "season", "situation")},
+}
+MAX_DELTAS = 8              # appended batches kept apart before an index is re-sorted
+
+
+def _codes(column):
+    """Integer codes for a key column; equal values share a code, NaN is -1."""
+    if pd.api.types.is_categorical_dtype(column):
+        return column.cat.codes.to_numpy()
+    return pd.factorize(column)[0]
+
+
+class GroupIndex:
+    """Sorted copy of `frame` plus offsets for every prefix of `keys`."""
+
+    def __init__(self, frame, keys):
+        self.keys = tuple(keys)
+        self.frame = frame.sort_values(list(self.keys), kind="mergesort").reset_index(drop=True)
+        self.offsets = {}
+        self.deltas = []            # indexes over rows appended since the sort
+
+        n = len(self.frame)
+        change = np.zeros(max(n - 1, 0), dtype=bool)
+        for level, key in enumerate(self.keys, start=1):
+            codes = _codes(self.frame[key])
+            change |= codes[1:] != codes[:-1]
+            starts = np.flatnonzero(np.r_[True, change]) if n else np.array([], dtype=int)
+            stops = np.r_[starts[1:], n]
+            prefix = self.frame[list(self.keys[:level])].iloc[starts]
+            for values, start, stop in zip(prefix.itertuples(index=False, name=None), starts, stops):
+                if any(pd.isna(v) for v in values):
+                    continue
+                self.offsets[values] = (int(start), int(stop))
+
+    def lookup(self, *key):
+        """Rows whose leading key columns equal `key` (empty frame if none)."""
+        start, stop = self.offsets.get(tuple(key), (0, 0))
+        rows = self.frame.iloc[start:stop]
+        if self.deltas:
+            rows = pd.concat([rows] + [delta.lookup(*key) for delta in self.deltas])
+        return rows
+
+    def lookup_many(self, keys):
+        """Rows for several keys at once; repeated keys are only returned once."""
+        keys = list(dict.fromkeys(k if isinstance(k, tuple) else (k,) for k in keys))
+        return pd.concat([self.lookup(*k) for k in keys])
+
+    def extended(self, rows):
+        """New index over this index's rows plus `rows`, which are indexed on their own.
+
+        `rows` must carry the categories of the frame they were appended to
+        (a superset of this index's). After MAX_DELTAS appends everything is
+        re-sorted into a single index.
+        """
+        frames = [self.frame] + [delta.frame for delta in self.deltas]
+        frames = [_with_categories(frame, rows) for frame in frames]
+        if len(frames) > MAX_DELTAS:
+            return GroupIndex(pd.concat(frames + [rows], ignore_index=True), self.keys)
+        index = copy.copy(self)
+        index.frame = frames[0]
+        index.deltas = [copy.copy(delta) for delta in self.deltas]
+        for delta, frame in zip(index.deltas, frames[1:]):
+            delta.frame = frame
+        index.deltas.append(GroupIndex(rows, self.keys))
+        return index
+
+
+def _with_categories(frame, rows):
+    """`frame` with its categorical columns widened to the categories of `rows`."""
+    changed = {column: frame[column].cat.set_categories(rows[column].cat.categories)
+               for column in frame.columns
+               if pd.api.types.is_categorical_dtype(frame[column])
+               and not frame[column].cat.categories.equals(rows[column].cat.categories)}
+    return frame.assign(**changed) if changed else frame
+
+
+#(section, name) -> the shared index
+_indexes = {(section, name): data_loader.Shared(f"index.{section}.{name}",
+                                                lambda frame, keys=keys: GroupIndex(frame, keys))
+            for section, names in INDEXES.items() for name, keys in names.items()}
+
+
+def extend(replaced):
+    """Carry the indexes over each old frame in `replaced` (pairs of old, new
+    frame from data_loader.append) over to the new frame."""
+    for index in _indexes.values():
+        for old, new in replaced:
+            index.carry(old, new, lambda built, rows=new.iloc[len(old):]: built.extended(rows))
+
+
+def get_index(section, name):
+    """Return the shared index `name` over `section`, rebuilding it if the data reloaded."""
+    return _indexes[(section, name)].get(data_loader.load_section(section))
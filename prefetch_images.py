@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+Warm the player image cache for the whole roster.
+
+Resolves and downloads the image of every player in filtered_players.csv
+with bounded concurrency, writing into the same cache the app reads from,
+and records the outcome per player in image_cache/manifest.json. Players
+that are already cached are skipped, so an interrupted run resumes where
+it stopped. Run the app with PLAYER_IMAGES_OFFLINE=1 afterwards to keep it
+off the network entirely.
+
+    python prefetch_images.py [--workers 8] [--force]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import data_loader
+import image_service
+
+
+def prefetch(service, names, workers=8, force=False):
+    """Fetch every name not yet cached; returns {name: manifest entry}."""
+    results = {}
+    todo = []
+    for name in names:
+        if not force and service.cached(name) is not None:
+            results[name] = {"status": "cached", **service.entry(name)}
+        else:
+            todo.append(name)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(service.refresh, name): name for name in todo}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                future.result()
+                results[name] = {"status": "fetched", **service.entry(name)}
+            except Exception as exc:
+                results[name] = {"status": "failed", "error": f"{type(exc).__name__}: {exc}"}
+            print(f"{results[name]['status']:>8}  {name}", flush=True)
+    return results
+
+
+def write_manifest(service, results):
+    path = os.path.join(service.cache_dir, "manifest.json")
+    manifest = {"generated": time.strftime("%Y-%m-%dT%H:%M:%S"), "players": results}
+    image_service._atomic_write(path, json.dumps(manifest, indent=1, ensure_ascii=False).encode())
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prefetch player images into the app's image cache")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent downloads")
+    parser.add_argument("--force", action="store_true", help="re-download players that are already cached")
+    parser.add_argument("--timeout", type=float, default=10.0, help="per-request timeout in seconds")
+    args = parser.parse_args()
+
+    names = data_loader.load_table("players")["Player Name"].tolist()
+    service = image_service.ImageService(timeout=args.timeout, workers=args.workers)
+    results = prefetch(service, names, workers=args.workers, force=args.force)
+    path = write_manifest(service, results)
+
+    failed = {n: r["error"] for n, r in results.items() if r["status"] == "failed"}
+    print(f"{len(names) - len(failed)}/{len(names)} players cached, manifest written to {path}")
+    for name, error in failed.items():
+        print(f"  FAILED {name}: {error}")
+    sys.exit(1 if failed else 0)
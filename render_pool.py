@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+Process pool that renders the matplotlib/mplsoccer figures.
+
+Matplotlib holds the GIL while it draws and is not thread-safe, so figures
+rendered on the Streamlit script thread keep a page to one core. Figure
+jobs go to worker processes instead, which import figures.py once (Agg
+backend) and send back PNG bytes, so the radar, the heat maps and the shot
+scatter of a page render in parallel while the script carries on.
+
+At most `max_pending` jobs are queued or running at once; submit() waits
+for a free slot. A job that is not done `timeout` seconds after it was
+submitted, or found no slot in that time, raises RenderTimeout to whoever
+waits on it; a running one is left to finish in its worker. A job whose
+builder raised or whose worker died raises RenderError. Builders are named rather than passed, so they must
+be top-level functions of figures.py and their arguments picklable.
+
+The pool has RENDER_WORKERS processes (default: one per core, at most 8);
+RENDER_WORKERS=0 renders in the calling thread instead. Workers are
+forked: Streamlit runs the page as __main__, and multiprocessing re-runs
+the parent's __main__ in every "spawn" or "forkserver" worker, so those
+would run the whole page. Where fork is not available the default is 0.
+
+Forking a process that runs other threads can leave the child stuck on a
+lock one of them held at that moment (CPython issue 90622), and
+ProcessPoolExecutor forks workers on demand from whichever thread submits.
+start() forks every worker at once instead, and the page calls it right
+after its imports, before it starts threads of its own (the Streamlit
+server's are already running). A pool that broke because a worker died is
+replaced the same way; that is the only fork after start().
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent import futures
+
+import timings
+
+logger = logging.getLogger(__name__)
+
+FORK = hasattr(os, "fork")
+WORKERS = min(8, os.cpu_count() or 1) if FORK else 0
+TIMEOUT = 60.0                  # seconds from submit to PNG
+
+
+class RenderTimeout(TimeoutError):
+    """A figure job did not finish in time, or could not be queued in time."""
+
+
+class RenderError(RuntimeError):
+    """A figure job failed: its builder raised or the pool broke."""
+
+
+def _failure(builder, error):
+    logger.error("rendering %s failed", builder, exc_info=error)
+    failure = RenderError(f"{builder} failed: {error!r}")
+    failure.__cause__ = error
+    return failure
+
+
+def _init_worker():
+    import matplotlib
+    matplotlib.use("Agg")
+    import figures  # noqa: F401  (paid once per worker, not per job)
+
+
+def _ready():
+    return os.getpid()
+
+
+def _render(builder, args, kwargs):
+    """(PNG bytes, seconds) of figures.<builder>(*args, **kwargs); runs in a worker."""
+    import figures
+
+    start = time.perf_counter()
+    png = figures.to_png(getattr(figures, builder)(*args, **kwargs))
+    return png, time.perf_counter() - start
+
+
+class RenderJob:
+    """A submitted figure; result() returns its PNG bytes."""
+
+    def __init__(self, future, builder, deadline=None):
+        self.future = future        # resolves to PNG bytes
+        self.builder = builder
+        self.deadline = deadline
+
+    @classmethod
+    def completed(cls, png, builder=None):
+        future = futures.Future()
+        future.set_result(png)
+        return cls(future, builder)
+
+    @classmethod
+    def failed(cls, error, builder=None):
+        future = futures.Future()
+        future.set_exception(error)
+        return cls(future, builder)
+
+    def done(self):
+        return self.future.done()
+
+    def add_done_callback(self, fn):
+        self.future.add_done_callback(fn)
+
+    def result(self):
+        """PNG bytes; raises RenderTimeout once the job's deadline has passed."""
+        remaining = None if self.deadline is None else max(0.0, self.deadline - time.monotonic())
+        try:
+            return self.future.result(remaining)
+        except RenderTimeout:
+            raise
+        except futures.TimeoutError:
+            raise RenderTimeout(f"{self.builder} did not render in time") from None
+
+
+class RenderPool:
+    """Bounded process pool for figure jobs."""
+
+    def __init__(self, workers=WORKERS, max_pending=None, timeout=TIMEOUT):
+        self.workers = workers
+        self.timeout = timeout
+        self.max_pending = max_pending or 4 * max(workers, 1)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self, broken=None):
+        import multiprocessing
+
+        with self._lock:
+            if self._executor is None or self._executor is broken:
+                if broken is not None:
+                    logger.warning("render pool broke, starting new workers")
+                    broken.shutdown(wait=False)
+                self._executor = futures.ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context("fork"), initializer=_init_worker)
+                #one job per worker, queued together while each new worker is still importing
+                #figures, so every worker is forked here rather than on demand by a later submit
+                for _ in range(self.workers):
+                    self._executor.submit(_ready)
+            return self._executor
+
+    def start(self):
+        """Fork every worker now (see the module docstring); submit() does it otherwise."""
+        if self.workers:
+            self._get_executor()
+
+    def submit(self, builder, *args, **kwargs):
+        """Queue figures.<builder>(*args, **kwargs); returns a RenderJob.
+
+        Waits for a free slot while `max_pending` jobs are in flight; if
+        none frees up within the timeout, the job fails with RenderTimeout.
+        """
+        from concurrent.futures.process import BrokenProcessPool
+
+        if self.workers == 0:
+            try:
+                with timings.timer(f"figure.{builder}"):
+                    png, _ = _render(builder, args, kwargs)
+            except Exception as exc:
+                return RenderJob.failed(_failure(builder, exc), builder)
+            return RenderJob.completed(png, builder)
+
+        deadline = time.monotonic() + self.timeout
+        if not self._slots.acquire(timeout=self.timeout):
+            return RenderJob.failed(RenderTimeout(f"render queue full ({self.max_pending} jobs)"), builder)
+        try:
+            executor = self._get_executor()
+            try:
+                inner = executor.submit(_render, builder, args, kwargs)
+            except BrokenProcessPool:
+                inner = self._get_executor(broken=executor).submit(_render, builder, args, kwargs)
+        except BrokenProcessPool as exc:
+            self._slots.release()
+            return RenderJob.failed(_failure(builder, exc), builder)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        outer = futures.Future()
+
+        def finish(inner):
+            self._slots.release()
+            if inner.cancelled():
+                outer.cancel()
+                return
+            error = inner.exception()
+            if error is not None:
+                outer.set_exception(_failure(builder, error))
+                return
+            png, seconds = inner.result()
+            timings.record(f"figure.{builder}", seconds)
+            outer.set_result(png)
+        inner.add_done_callback(finish)
+        return RenderJob(outer, builder, deadline)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Process-wide RenderPool, sized by RENDER_WORKERS."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = RenderPool(int(os.environ.get("RENDER_WORKERS", WORKERS)))
+    return _pool
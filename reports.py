@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+"""
+Static HTML/PNG reports for fixed player comparisons.
+
+    python reports.py --top 6
+    python reports.py --pairs "Harry Kane,Mohamed Salah" "Harry Kane,Son Heung-Min" --seasons 2020 2016-2020
+
+Every pair and season selection gets reports/<pair>/<seasons>/index.html
+with the page's sections (general information, season trends, the radar
+and percentile ranks, goals by body part, heat maps, shot outcomes, the
+shot scatter and the assist tables), computed by analytics.py and drawn
+by charts.py and figures.py exactly as on the page.
+
+Work shared between reports is done once: a selection's analytics for all
+of its players together, and each player's heat map once per selection and
+colour map (under reports/_players/). The matplotlib figures render in
+parallel on a render_pool.RenderPool. Reports are skipped when the data
+files have not changed since they were written, unless --force is given.
+
+reports/figures.json lists every figure with its figure cache key, so
+while the data files are unchanged the live page serves those PNGs
+(figure_cache.submit) in place of rendering them, and analytics_service.py
+serves the reports themselves under /reports/.
+"""
+
+import argparse
+import html
+import json
+import logging
+import os
+import posixpath
+import re
+import threading
+import time
+import unicodedata
+
+import aggregates
+import analytics
+import data_loader
+import render_pool
+
+logger = logging.getLogger(__name__)
+
+REPORT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "reports")
+SHARED_DIR = "_players"
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data.encode() if isinstance(data, str) else data)
+    os.replace(tmp, path)
+
+
+def _read_json(path, default):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def data_files():
+    """Modification time of each source table; reports are current while these are unchanged."""
+    return {name: os.path.getmtime(os.path.join(data_loader.DATA_DIR, data_loader.DATA_FILES[name]))
+            for name in ("players", "shots", "apps")}
+
+
+def figure_key(kind, params):
+    """figures.json key of a figure cache entry (kind, params)."""
+    return json.dumps([kind, params])
+
+
+def slug(name):
+    ascii_name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-z0-9]+", "-", ascii_name.lower()).strip("-")
+
+
+def label(seasons):
+    return str(seasons[0]) if len(seasons) == 1 else f"{seasons[0]}-{seasons[-1]}"
+
+
+def parse_seasons(spec):
+    """(2020,) for "2020", (2016, ..., 2020) for "2016-2020"."""
+    first, _, last = spec.partition("-")
+    return tuple(range(int(first), int(last or first) + 1))
+
+
+def report_path(pair, seasons):
+    """Report directory of `pair` in `seasons`, relative to the report root."""
+    return f"{'--'.join(slug(p) for p in pair)}/{label(seasons)}"
+
+
+##################################Serving prerendered figures#############################
+
+_figures = None             # ((path, mtime) of figures.json, its contents)
+_figures_lock = threading.Lock()
+
+
+def prerendered(kind, params, report_dir=REPORT_DIR):
+    """PNG bytes of the figure (kind, params) if a current report drew it, else None."""
+    global _figures
+    path = os.path.join(report_dir, "figures.json")
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with _figures_lock:
+        if _figures is None or _figures[0] != (path, mtime):
+            _figures = ((path, mtime), _read_json(path, {}))
+        index = _figures[1]
+    if index.get("data_files") != data_files():
+        return None
+    relative = index.get("figures", {}).get(figure_key(kind, params))
+    if relative is None:
+        return None
+    try:
+        with open(os.path.join(report_dir, relative), "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+##################################Building#############################
+
+def top_scorers(seasons, n):
+    """The `n` players with the most goals over `seasons`."""
+    table = aggregates.get_table()
+    in_seasons = table.index.get_level_values("season").isin(list(seasons))
+    goals = table[in_seasons].groupby(level="PlayerName")["Goals"].sum()
+    return goals.sort_values(ascending=False, kind="mergesort").index[:n].tolist()
+
+
+def _table(frame, index=True):
+    return frame.to_html(index=index, border=0, classes="data", float_format=lambda v: f"{v:.2f}")
+
+
+def _figure(fig):
+    return fig.to_html(full_html=False, include_plotlyjs=False)
+
+
+def _page(pair, seasons, sections):
+    title = f"{html.escape(pair[0])} vs {html.escape(pair[1])}, {label(seasons)}"
+    body = [f"<h1>{title}</h1>"]
+    for heading, content in sections:
+        body.append(f"<h2>{heading}</h2>\n{content}")
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title>
+<script src="../../plotly.min.js"></script>
+<style>
+body {{font-family: sans-serif; max-width: 1200px; margin: auto;}}
+table.data {{border-collapse: collapse; margin: 0 1em 1em 0; display: inline-table; vertical-align: top;}}
+table.data th {{background-color: #AFBCD6; padding: 2px 8px;}}
+table.data td {{padding: 2px 8px; text-align: right;}}
+img {{max-width: 100%;}} .row {{display: flex; gap: 1em;}} .row > div {{flex: 1;}}
+</style></head>
+<body>
+{chr(10).join(body)}
+<p><small>Generated {time.strftime('%Y-%m-%d %H:%M')} by reports.py.</small></p>
+</body></html>
+"""
+
+
+def build(pairs, selections, report_dir=REPORT_DIR, workers=render_pool.WORKERS,
+          heatmap="grid_heatmap", force=False):
+    """Write the reports of every pair in every season selection; returns {report path: status}."""
+    import charts
+    from plotly.offline import get_plotlyjs
+
+    files = data_files()
+    manifest = _read_json(os.path.join(report_dir, "manifest.json"), {})
+    index = _read_json(os.path.join(report_dir, "figures.json"), {})
+    figures = index.get("figures", {}) if index.get("data_files") == files else {}
+    pool = render_pool.RenderPool(workers)
+    jobs = {}               # figure file -> (figure key, RenderJob)
+    pages = {}              # report path -> (html, figure files it shows, manifest entry)
+    status = {}
+
+    def submit(relative, kind, params, builder, *args, **kwargs):
+        if relative not in jobs:
+            jobs[relative] = (figure_key(kind, params), pool.submit(builder, *args, **kwargs))
+        return relative
+
+    for seasons in selections:
+        todo = []
+        for pair in pairs:
+            path = report_path(pair, seasons)
+            entry = manifest.get(path, {})
+            if not force and entry.get("data_files") == files and entry.get("heatmap") == heatmap:
+                status[path] = "current"
+            else:
+                todo.append(pair)
+        if not todo:
+            continue
+
+        #everything per player is computed once for all players of the selection
+        players = tuple(dict.fromkeys(p for pair in todo for p in pair))
+        shots = analytics.open_play_shots(players, seasons)
+        info = analytics.player_info(players).astype(str)
+        info.index = ['Age', 'Nationality', 'Position', 'Preferred Foot', 'Current Club']
+        trends = analytics.season_trends(players)
+        ranks = analytics.radar_percentiles(players, seasons).round(0).astype("Int64")
+        shot_types = analytics.shot_types(shots)
+        shot_results = analytics.shot_results(shots)
+        assisters = analytics.assisters_to(players, seasons)
+        assisted = analytics.assisted_by(players, seasons)
+
+        for pair in todo:
+            pair = tuple(pair)
+            path = report_path(pair, seasons)
+            color = dict(zip(pair, analytics.PLAYER_COLORS))
+            pair_shots = [shots[shots["shooterName"] == p] for p in pair]
+
+            #the same figure cache keys and arguments as the page
+            values, low, high, pair_ranks = analytics.radar_chart_args(pair, seasons)
+            radar = submit(f"{path}/radar.png", "radar", (pair, seasons), "radar_chart",
+                           aggregates.RADAR_METRICS, pair, values, [color[p] for p in pair], low, high, pair_ranks)
+            heatmaps = [submit(f"{SHARED_DIR}/{slug(p)}/{label(seasons)}/{heatmap}-{cmap}.png",
+                               heatmap, (p, seasons, cmap), heatmap,
+                               player_shots.positionX, player_shots.positionY, cmap, figsize=(8, 8))
+                        for p, cmap, player_shots in zip(pair, analytics.PLAYER_CMAPS, pair_shots)]
+            scatter = submit(f"{path}/shots_scatter.png", "shots_scatter", (pair, seasons, "All"),
+                             "shots_scatter", pair_shots)
+            images = [radar] + heatmaps + [scatter]
+
+            def img(relative):
+                return f'<img src="{html.escape(posixpath.relpath(relative, path))}">'
+
+            def per_player(frame, column):
+                #one partner table per player, indexed by the partner like on the page
+                tables = [frame[frame[column] == p].drop(columns=column) for p in pair]
+                return "".join(f"<div><h3>{html.escape(p)}</h3>{_table(t.set_index(t.columns[0]))}</div>"
+                               for p, t in zip(pair, tables))
+
+            sections = [
+                ("General Information", _table(info[list(pair)])),
+                ("Season Trends", _figure(charts.season_trends(trends[trends["PlayerName"].isin(pair)], color))),
+                ("Comparison of Key Metrics", img(radar) + "<h3>Percentile ranks</h3>" + _table(ranks.loc[list(pair)])),
+                ("Breakdown of Goals scored by Body Part", _figure(charts.body_part_pies(shot_types, pair))),
+                ("Heat Map of Shots", '<div class="row">' + "".join(f"<div>{img(h)}</div>" for h in heatmaps) + "</div>"),
+                ("Shot Outcomes", _figure(charts.shot_outcome_pies(shot_results, pair, analytics.SHOT_RESULT_COLORS))),
+                ("All Open Play Shots", img(scatter)),
+                ("Most assists to selected players", '<div class="row">' + per_player(assisters, "shooterName") + "</div>"),
+                ("Most assists by selected players", '<div class="row">' + per_player(assisted, "assisterName") + "</div>"),
+            ]
+            pages[path] = (_page(pair, seasons, sections), images,
+                           {"players": list(pair), "seasons": list(seasons), "data_files": files, "heatmap": heatmap})
+
+    failed = set()
+    for relative, (key, job) in jobs.items():
+        try:
+            _write(os.path.join(report_dir, relative), job.result())
+            figures[key] = relative
+        except Exception as exc:
+            logger.warning("could not render %s: %s", relative, exc)
+            failed.add(relative)
+    pool.shutdown()
+
+    for path, (page, images, entry) in pages.items():
+        if failed.intersection(images):
+            status[path] = "failed"
+            manifest.pop(path, None)
+            continue
+        _write(os.path.join(report_dir, path, "index.html"), page)
+        manifest[path] = entry
+        status[path] = "written"
+
+    if not os.path.exists(os.path.join(report_dir, "plotly.min.js")):
+        _write(os.path.join(report_dir, "plotly.min.js"), get_plotlyjs())
+    links = "\n".join(f'<li><a href="{html.escape(path)}/index.html">{html.escape(" vs ".join(entry["players"]))}, '
+                      f'{label(entry["seasons"])}</a></li>' for path, entry in sorted(manifest.items()))
+    _write(os.path.join(report_dir, "index.html"),
+           f'<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>Reports</title></head>\n'
+           f'<body><h1>Player comparison reports</h1>\n<ul>\n{links}\n</ul></body></html>\n')
+    _write(os.path.join(report_dir, "manifest.json"), json.dumps(manifest, indent=1))
+    _write(os.path.join(report_dir, "figures.json"), json.dumps({"data_files": files, "figures": figures}, indent=1))
+    return status
+
+
+if __name__ == "__main__":
+    import warnings
+    warnings.filterwarnings("ignore", category=DeprecationWarning)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    parser = argparse.ArgumentParser(description="Write static comparison reports")
+    parser.add_argument("--pairs", nargs="+", metavar="A,B", help="player pairs, e.g. \"Harry Kane,Mohamed Salah\"")
+    parser.add_argument("--top", type=int, default=4,
+                        help="without --pairs, every pair of the N top scorers over the selected seasons")
+    parser.add_argument("--seasons", nargs="+", metavar="SEASONS",
+                        help="selections, a season or a range (default: every season and all of them)")
+    parser.add_argument("--out", default=REPORT_DIR)
+    parser.add_argument("--workers", type=int, default=render_pool.WORKERS, help="render processes")
+    parser.add_argument("--heatmap", choices=["grid_heatmap", "kde_heatmap"], default="grid_heatmap")
+    parser.add_argument("--force", action="store_true", help="rewrite reports that are current")
+    args = parser.parse_args()
+
+    all_seasons = sorted(set(aggregates.get_table().index.get_level_values("season")))
+    if args.seasons:
+        selections = [parse_seasons(spec) for spec in args.seasons]
+    else:
+        selections = [(s,) for s in all_seasons] + [tuple(all_seasons)]
+    if args.pairs:
+        pairs = [tuple(p.strip() for p in pair.split(",")) for pair in args.pairs]
+        bad = [pair for pair in pairs if len(pair) != 2]
+        if bad:
+            parser.error(f"a pair is two comma separated players, got {bad[0]}")
+    else:
+        top = top_scorers(all_seasons, args.top)
+        pairs = [(a, b) for i, a in enumerate(top) for b in top[i + 1:]]
+
+    start = time.perf_counter()
+    status = build(pairs, selections, args.out, args.workers, args.heatmap, args.force)
+    counts = {s: sum(1 for v in status.values() if v == s) for s in ("written", "current", "failed")}
+    print(f"{counts['written']} reports written, {counts['current']} current, {counts['failed']} failed "
+          f"in {time.perf_counter() - start:.1f}s under {args.out}")
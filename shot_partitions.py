@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+"""
+Season and league partitions of the shots table, written chunk by chunk.
+
+    python shot_partitions.py
+    python shot_partitions.py --csv eredivisie_shots.csv --league Eredivisie
+
+Event data for more leagues and seasons will not fit in one process the
+way shots_modified.csv does, so a shots CSV is streamed through a pipeline
+of generators that never holds more than one chunk:
+
+    read_chunks -> coerce -> select -> scale -> write
+
+Chunks are cast to the store schema (columnar_store.SCHEMAS), optionally
+cut down to some seasons and situations, and get their pitch coordinates
+in metres (105x68), the transform analytics.open_play_shots otherwise does
+after loading. Rows without a league column take the one given, or else
+the league of their clubs (clubs.py). Each chunk then adds one Feather file
+to every season and league it covers:
+
+    partitions/shots/league=<league>/season=<season>/part-<n>.feather
+
+For every league with partitions, open_play_shots reads only the
+partitions of the selected seasons, each memory-mapped and indexed by
+shooter on first use. The shots table (shots_modified.csv, the five
+TABLE_LEAGUES) is read as before unless all of its leagues have partitions
+at least as new as the CSV. Rebuilding a league replaces that league's
+partitions only, and ingest.py adds new shots as one more chunk.
+"""
+
+import argparse
+import glob
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pyarrow import feather
+
+import clubs
+import columnar_store
+import data_loader
+import player_index
+import timings
+
+PARTITION_DIR = os.path.join("partitions", "shots")
+BUILT = "_built"                # touched in a league's directory after every write to it
+TABLE_LEAGUES = tuple(clubs.LEAGUES)     # leagues of the shots table (shots_modified.csv)
+CHUNKSIZE = 200_000
+PITCH = {"positionX": 105, "positionY": 68}
+INDEX_KEYS = ("shooterID", "situation")
+MAX_CACHED = 64                 # partitions kept in memory, least recently used dropped first
+
+COLUMNS = dict(columnar_store.SCHEMAS["shots"], league="category")
+#one dictionary index type for every file, so parts with different categories concatenate
+SCHEMA = pa.schema([(column, pa.dictionary(pa.int32(), pa.string()) if dtype == "category"
+                     else pa.from_numpy_dtype(np.dtype(dtype)))
+                    for column, dtype in COLUMNS.items()])
+
+
+def _root(data_dir=None):
+    return os.path.join(data_dir or data_loader.DATA_DIR, PARTITION_DIR)
+
+
+##################################Pipeline#############################
+
+def read_chunks(path, chunksize=CHUNKSIZE):
+    """DataFrames of up to `chunksize` rows of the CSV at `path`."""
+    with pd.read_csv(path, chunksize=chunksize) as reader:
+        yield from reader
+
+
+def coerce(chunks, league=None):
+    """Chunks cast to the store schema; chunks without a league column get `league`, or that of their clubs."""
+    for chunk in chunks:
+        if "league" not in chunk.columns:
+            chunk = chunk.assign(league=league or clubs.leagues(chunk["HomeTeam"], chunk["AwayTeam"]))
+        yield columnar_store.coerce("shots", chunk[list(COLUMNS)]).astype({"league": "category"})
+
+
+def select(chunks, seasons=None, situations=None):
+    """Chunks cut down to `seasons` and `situations` (everything if None); empty ones are dropped."""
+    for chunk in chunks:
+        keep = np.ones(len(chunk), dtype=bool)
+        if seasons is not None:
+            keep &= chunk["season"].isin(seasons).to_numpy()
+        if situations is not None:
+            keep &= chunk["situation"].isin(situations).to_numpy()
+        if keep.any():
+            yield chunk if keep.all() else chunk[keep]
+
+
+def scale(chunks):
+    """Chunks with positionX and positionY in metres on a 105x68 pitch."""
+    for chunk in chunks:
+        yield chunk.assign(**{column: round(chunk[column] * length, 2) for column, length in PITCH.items()})
+
+
+def write(chunks, root):
+    """Add one file per (league, season) of every chunk under `root`; returns rows written per partition."""
+    written = {}
+    for chunk in chunks:
+        for (league, season), rows in chunk.groupby(["league", "season"], observed=True, sort=False):
+            directory = os.path.join(root, f"league={league}", f"season={season}")
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"part-{len(glob.glob(os.path.join(directory, 'part-*.feather'))):05d}.feather")
+            table = pa.Table.from_pandas(rows.reset_index(drop=True), schema=SCHEMA, preserve_index=False)
+            #readers only pick up finished parts
+            tmp = os.path.join(directory, f".{os.path.basename(path)}.{os.getpid()}.tmp")
+            feather.write_feather(table, tmp, compression="uncompressed")
+            os.replace(tmp, path)
+            written[(league, int(season))] = written.get((league, int(season)), 0) + len(rows)
+    return written
+
+
+def _touch(directory):
+    with open(os.path.join(directory, BUILT), "a"):
+        pass
+    os.utime(os.path.join(directory, BUILT))
+
+
+def touch(leagues, data_dir=None):
+    """Mark the partitions of `leagues` as up to date, e.g. with rows just appended to the shots CSV."""
+    for league in leagues:
+        directory = os.path.join(_root(data_dir), f"league={league}")
+        if os.path.isdir(directory):
+            _touch(directory)
+
+
+def build(csv_path, data_dir=None, league=None, seasons=None, situations=None, chunksize=CHUNKSIZE):
+    """Stream the shots CSV at `csv_path` into partitions; returns rows written per partition.
+
+    Partitions are staged next to the live ones, and every league in the
+    CSV replaces its old partitions once the whole file has been read.
+    """
+    root = _root(data_dir)
+    staging = f"{root}.{os.getpid()}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    with timings.timer("partitions.build"):
+        written = write(scale(select(coerce(read_chunks(csv_path, chunksize), league), seasons, situations)),
+                        staging)
+        os.makedirs(root, exist_ok=True)
+        for league_dir in sorted(glob.glob(os.path.join(staging, "league=*"))):
+            target = os.path.join(root, os.path.basename(league_dir))
+            shutil.rmtree(target, ignore_errors=True)
+            os.replace(league_dir, target)
+            _touch(target)
+        shutil.rmtree(staging, ignore_errors=True)
+    return written
+
+
+def append(rows, data_dir=None, league=None):
+    """Add new shot rows to the partitions as one more chunk; returns rows written per partition."""
+    written = write(scale(coerce([rows], league)), _root(data_dir))
+    touch({league for league, _ in written}, data_dir)
+    return written
+
+
+##################################Reading#############################
+
+def available(league, data_dir=None):
+    """Whether `league` has built partitions; for TABLE_LEAGUES, also at least as new as the shots CSV."""
+    data_dir = data_dir or data_loader.DATA_DIR
+    built = os.path.join(_root(data_dir), f"league={league}", BUILT)
+    if not os.path.exists(built):
+        return False
+    csv_path = os.path.join(data_dir, data_loader.DATA_FILES["shots"])
+    return league not in TABLE_LEAGUES or os.path.getmtime(built) >= os.path.getmtime(csv_path)
+
+
+def table_partitioned(data_dir=None):
+    """Whether every league of the shots table is read from its partitions in place of the table."""
+    return all(available(league, data_dir) for league in TABLE_LEAGUES)
+
+
+def leagues(data_dir=None):
+    """Leagues read from their partitions: those of available(), TABLE_LEAGUES only if table_partitioned()."""
+    found = sorted(os.path.basename(path)[len("league="):]
+                   for path in glob.glob(os.path.join(_root(data_dir), "league=*")))
+    table = table_partitioned(data_dir)
+    return [league for league in found if (table or league not in TABLE_LEAGUES) and available(league, data_dir)]
+
+
+def partitions(seasons=None, leagues=None, data_dir=None):
+    """Directories of the partitions of `seasons` and `leagues` (all if None), in the order of `seasons`."""
+    root = _root(data_dir)
+    patterns = ["season=*"] if seasons is None else [f"season={int(s)}" for s in seasons]
+    found = []
+    for pattern in patterns:
+        for path in sorted(glob.glob(os.path.join(root, "league=*", pattern))):
+            if leagues is None or os.path.basename(os.path.dirname(path))[len("league="):] in leagues:
+                found.append(path)
+    return found
+
+
+def _parts(path):
+    return tuple((part, os.path.getmtime(part)) for part in sorted(glob.glob(os.path.join(path, "part-*.feather"))))
+
+
+def _cast(table):
+    """`table` in the current SCHEMA, for parts written under an older one (e.g. float32 assisterID)."""
+    schema = pa.schema([SCHEMA.field(name) for name in table.column_names])
+    return table if table.schema.equals(schema, check_metadata=False) else table.cast(schema)
+
+
+def _read(parts, columns=None):
+    tables = [feather.read_table(part, columns=columns, memory_map=True) for part in parts]
+    tables = [_cast(table) for table in tables]
+    return pa.concat_tables(tables).to_pandas() if tables else pd.DataFrame(columns=columns or list(COLUMNS))
+
+
+def read(seasons=None, leagues=None, columns=None, data_dir=None):
+    """The shots of `seasons` and `leagues` (all if None) as one frame, coordinates in metres."""
+    paths = partitions(seasons, leagues, data_dir)
+    return _read([part for path in paths for part, _ in _parts(path)], columns)
+
+
+_cache = OrderedDict()      # partition directory -> dict(parts, frame, index)
+_summaries = {}             # (summarize, columns, partition directory) -> (parts, summary)
+_combined = {}              # (summarize, columns, leagues, data_dir) -> (parts, summary) of summary()
+_lock = threading.Lock()
+
+
+def summary(columns, summarize, leagues=None, data_dir=None):
+    """Shared frame of `summarize` over `columns` of each partition of `leagues` (all if None), concatenated.
+
+    Partitions are read one at a time and only their summaries are kept
+    (e.g. the distinct players or the assist edges of each), so the shots of
+    every league are never in memory at once. A partition is re-read only
+    when its parts change, and the result is the same frame until one does.
+    """
+    parts = {path: _parts(path) for path in partitions(None, leagues, data_dir)}
+    key = (summarize, tuple(columns), tuple(leagues) if leagues is not None else None, data_dir)
+    with _lock:
+        entry = _combined.get(key)
+    if entry is not None and entry[0] == parts:
+        return entry[1]
+
+    start = time.perf_counter()
+    frames = []
+    for path, path_parts in parts.items():
+        with _lock:
+            cached = _summaries.get((summarize, tuple(columns), path))
+        if cached is None or cached[0] != path_parts:
+            cached = (path_parts, summarize(_read([part for part, _ in path_parts], columns)))
+            with _lock:
+                _summaries[(summarize, tuple(columns), path)] = cached
+        frames.append(cached[1])
+    frame = pd.concat(frames, ignore_index=True) if frames else summarize(_read([], columns))
+    timings.record("load.partitions", time.perf_counter() - start)
+    with _lock:
+        _combined[key] = (parts, frame)
+    return frame
+
+
+def sections(section, summarize):
+    """The shared frames of store section `section` (columnar_store.SECTION_COLUMNS) over every league.
+
+    Returns (partitions, table): the summary() of the partitions of
+    leagues() and the section of the shots table, None where not read (no
+    partitions, or table_partitioned()). Each is kept until its files
+    change, so caches can be keyed on them. Partition coordinates are in metres.
+    """
+    columns = columnar_store.SECTION_COLUMNS[section][1]
+    found = leagues()
+    return (summary(columns, summarize, found) if found else None,
+            None if table_partitioned() else data_loader.load_section(section))
+
+
+def _entry(path):
+    parts = _parts(path)
+    with _lock:
+        entry = _cache.get(path)
+        if entry is not None and entry["parts"] == parts:
+            _cache.move_to_end(path)
+            return entry
+
+    start = time.perf_counter()
+    frame = _read([part for part, _ in parts])
+    timings.record("load.partition", time.perf_counter() - start)
+    entry = {"parts": parts, "frame": frame, "index": None}
+    with _lock:
+        _cache[path] = entry
+        while len(_cache) > MAX_CACHED:
+            _cache.popitem(last=False)
+    return entry
+
+
+def index(path):
+    """Shared shooter index (player_index.GroupIndex over shooterID, situation) of one partition."""
+    entry = _entry(path)
+    if entry["index"] is None:
+        with timings.timer("index.partition"):
+            entry["index"] = player_index.GroupIndex(entry["frame"], INDEX_KEYS)
+    return entry["index"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write the shots CSV as season/league partitions")
+    parser.add_argument("--csv", default=os.path.join(data_loader.DATA_DIR, data_loader.DATA_FILES["shots"]))
+    parser.add_argument("--data-dir", default=data_loader.DATA_DIR)
+    parser.add_argument("--league", help="league of rows without a league column (default: that of their clubs)")
+    parser.add_argument("--seasons", type=int, nargs="+", help="only keep these seasons")
+    parser.add_argument("--situations", nargs="+", help="only keep these situations, e.g. OpenPlay")
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    written = build(args.csv, args.data_dir, args.league, args.seasons, args.situations, args.chunksize)
+    for (league, season), rows in sorted(written.items()):
+        print(f"{league} {season}: {rows} shots")
+    print(f"wrote {sum(written.values())} shots to {len(written)} partitions "
+          f"in {time.perf_counter() - start:.2f}s under {_root(args.data_dir)}")
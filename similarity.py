@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Nearest-neighbour search over player-season per-90 profiles.
+
+Every player-season of the aggregate table with at least
+aggregates.MIN_MINUTES played becomes a vector of the radar metrics, z-scored over all such
+player-seasons so each metric weighs the same. The vectors go into k-d
+trees (one over all seasons, one per season), so "players most similar to
+X in season Y" is a tree query in well under a millisecond even for a
+roster far larger than filtered_players.csv. Indexes are rebuilt whenever
+the aggregate table changes; scipy is imported on first build.
+"""
+
+import numpy as np
+import pandas as pd
+
+import aggregates
+import data_loader
+
+FEATURES = aggregates.RADAR_METRICS
+
+
+class SimilarityIndex:
+    """k-d trees over the normalised per-90 vectors of a player-season aggregate table."""
+
+    def __init__(self, table, min_minutes=aggregates.MIN_MINUTES):
+        from scipy.spatial import cKDTree
+
+        values = table[FEATURES].to_numpy(dtype=float)
+        profiled = (table["Minutes"].to_numpy() >= min_minutes) & ~np.isnan(values).any(axis=1)
+        self.mean = values[profiled].mean(axis=0) if profiled.any() else np.zeros(len(FEATURES))
+        std = values[profiled].std(axis=0) if profiled.any() else np.ones(len(FEATURES))
+        self.std = np.where(std > 0, std, 1.0)
+        #every player-season keeps a vector for queries; only profiled ones are searched
+        self.values = values
+        self.vectors = (values - self.mean) / self.std
+        self.names = table.index.get_level_values("PlayerName").to_numpy()
+        self.seasons = table.index.get_level_values("season").to_numpy()
+        self.rows = {key: i for i, key in enumerate(table.index)}
+
+        #season (None for all seasons) -> (tree, table positions of its vectors)
+        self.trees = {}
+        for season in [None] + sorted(set(self.seasons[profiled].tolist())):
+            positions = np.flatnonzero(profiled if season is None else profiled & (self.seasons == season))
+            self.trees[season] = (cKDTree(self.vectors[positions]), positions)
+
+    def vector(self, player, season):
+        """Normalised profile of `player` in `season` (even below the minimum minutes); raises ValueError."""
+        row = self.rows.get((player, int(season)))
+        if row is None or np.isnan(self.vectors[row]).any():
+            raise ValueError(f"{player} played no minutes in {season}")
+        return self.vectors[row]
+
+    def similar(self, player, season, k=5, same_season=True, exclude=()):
+        """The `k` player-seasons closest to `player` in `season`, nearest first.
+
+        Candidates are restricted to `season` unless `same_season` is False;
+        the player's own seasons and the players in `exclude` are skipped.
+        """
+        target = self.vector(player, season)
+        tree, positions = self.trees.get(int(season) if same_season else None, (None, np.array([], dtype=int)))
+        skip = list(set(exclude) | {player})
+        if tree is None:
+            found = np.array([], dtype=int)
+            distances = np.array([])
+        else:
+            #a skipped player has at most one vector per season, so this many still leaves k
+            wanted = k + len(skip) * (1 if same_season else len(self.trees) - 1)
+            distances, found = tree.query(target, k=min(wanted, len(positions)))
+            distances, found = np.atleast_1d(distances), positions[np.atleast_1d(found)]
+            keep = ~np.isin(self.names[found], skip)
+            distances, found = distances[keep][:k], found[keep][:k]
+
+        result = {"PlayerName": self.names[found], "season": self.seasons[found], "distance": distances.round(3)}
+        result.update(zip(FEATURES, self.values[found].T))
+        return pd.DataFrame(result, columns=["PlayerName", "season", "distance"] + FEATURES)
+
+
+_index = data_loader.Shared("similarity.build", SimilarityIndex)
+
+
+def get_index():
+    """Return the shared index, rebuilding it if the aggregate table changed."""
+    return _index.get(aggregates.get_table())
@@ -1,11 +1,44 @@
 # -*- coding: utf-8 -*-
 """
 
-@author: Arushi, Jake, Ana 
+@author: Arushi, Jake, Ana
+
+Starts the app. requirements.txt is only installed when a package is
+missing (checked against the installed metadata, without importing
+anything), so a warm start goes straight to `streamlit run`. Pass
+--reinstall to force `pip install -r requirements.txt` as before.
 """
 
 import os
+import sys
+from importlib import metadata
+
+
+def check_requirements(path='requirements.txt'):
+    """Return (missing, mismatched) requirement lines of `path`."""
+    missing, mismatched = [], []
+    with open(path) as f:
+        for line in f:
+            line = line.split('#')[0].strip()
+            if not line:
+                continue
+            name, _, wanted = line.partition('==')
+            try:
+                installed = metadata.version(name.strip())
+            except metadata.PackageNotFoundError:
+                missing.append(line)
+                continue
+            if wanted and installed != wanted.strip():
+                mismatched.append(f'{line} (installed {installed})')
+    return missing, mismatched
 
 
-os.system('pip install -r requirements.txt')
-os.system('streamlit run FootballAnalytics.py')
+if __name__ == '__main__':
+    missing, mismatched = check_requirements()
+    if '--reinstall' in sys.argv[1:] or missing:
+        if missing:
+            print('missing: ' + ', '.join(missing))
+        os.system('pip install -r requirements.txt')
+    elif mismatched:
+        print('warning: installed versions differ from requirements.txt: ' + ', '.join(mismatched))
+    os.system('streamlit run FootballAnalytics.py')
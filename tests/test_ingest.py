@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+Ingest of real match rows (ingest.py) into a copy of the tables.
+
+A game is taken out of a temporary copy of shots_modified.csv and then
+ingested again from its original rows, so every value the real data
+holds (unassisted shots, shots without a lastAction) goes through
+validation. Run from the repository root: python -m pytest tests
+"""
+
+import csv
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+import data_loader
+import ingest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    for name in data_loader.DATA_FILES.values():
+        shutil.copy(os.path.join(ROOT, name), tmp_path)
+    monkeypatch.setattr(data_loader, "DATA_DIR", str(tmp_path))
+    return tmp_path
+
+
+def _game_with_empty_last_action():
+    shots = pd.read_csv(os.path.join(ROOT, data_loader.DATA_FILES["shots"]), keep_default_na=False)
+    no_action = set(shots.loc[shots["lastAction"].isin(["", "None"]), "gameID"])
+    unassisted = set(shots.loc[shots["assisterName"] == "", "gameID"])
+    return min(no_action & unassisted or no_action)
+
+
+def _hold_out(data_dir, game):
+    """Remove the shots of `game` from the copied CSV, leaving every other line as it was."""
+    path = os.path.join(data_dir, data_loader.DATA_FILES["shots"])
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        lines = f.readlines()
+    column = next(csv.reader([lines[0]])).index("gameID")
+    kept = [line for i, line in enumerate(lines) if i == 0 or next(csv.reader([line]))[column] != str(game)]
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        f.writelines(kept)
+    return len(lines) - len(kept)
+
+
+@pytest.mark.parametrize("empty", ["as read", "null"])
+def test_ingest_existing_game_unchanged(data_dir, empty):
+    game = _game_with_empty_last_action()
+    rows = pd.read_csv(os.path.join(ROOT, data_loader.DATA_FILES["shots"]))
+    rows = rows[rows["gameID"] == game]
+    if empty == "null":
+        #as the JSON of POST /ingest carries them
+        rows = rows.assign(lastAction=rows["lastAction"].where(rows["lastAction"] != "None", None))
+    held_out = _hold_out(data_dir, game)
+    before = len(data_loader.load_table("shots"))
+
+    summary = ingest.append(shots=rows)
+
+    assert summary["rows"] == {"shots": held_out}
+    shots = data_loader.load_table("shots")
+    assert len(shots) == before + held_out
+    assert len(pd.read_csv(os.path.join(data_dir, data_loader.DATA_FILES["shots"]))) == before + held_out
+    with open(os.path.join(data_dir, data_loader.DATA_FILES["shots"]), "rb") as f:
+        data = f.read()
+    assert data.count(b"\n") == data.count(b"\r\n") == before + held_out + 1
+    with pytest.raises(ValueError, match="already ingested"):
+        ingest.append(shots=rows)
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+Per-stage timing of the hot paths (data load, filters, groupbys, figure
+renders, image fetches).
+
+Every stage records its wall time into a process-wide histogram with
+Prometheus-style cumulative buckets plus a rolling window of recent samples
+for p50/p95/p99. The same numbers are exposed three ways:
+
+* report() as a DataFrame, shown in the page's debug panel (?debug=1),
+* prometheus() as Prometheus text, served on /metrics by
+  analytics_service.py or by serve() (METRICS_PORT=9100 for the app),
+* one `stage=... seconds=...` DEBUG log line per sample on this logger.
+"""
+
+import functools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+METRIC = "sportsanalytics_stage_seconds"
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+WINDOW = 2048               # recent samples kept per stage for the quantiles
+
+
+class Histogram:
+    """Bucketed counts, sum and a rolling window of one stage's durations."""
+
+    def __init__(self, buckets=BUCKETS, window=WINDOW):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.last = 0.0
+        self.samples = deque(maxlen=window)
+
+    def observe(self, seconds):
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[i] += 1
+        self.count += 1
+        self.sum += seconds
+        self.last = seconds
+        self.samples.append(seconds)
+
+
+_histograms = {}            # stage -> Histogram
+_lock = threading.Lock()
+
+
+def record(stage, seconds):
+    """Add one sample of `stage`."""
+    with _lock:
+        histogram = _histograms.get(stage)
+        if histogram is None:
+            histogram = _histograms[stage] = Histogram()
+        histogram.observe(seconds)
+    logger.debug("stage=%s seconds=%.6f", stage, seconds)
+
+
+@contextmanager
+def timer(stage):
+    """Time the body of a `with` block as `stage`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+
+
+def timed(stage):
+    """Decorator timing every call of a function as `stage`."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def report():
+    """Count, last, p50/p95/p99 (ms) and total seconds of every stage, by stage name."""
+    with _lock:
+        snapshot = {s: (h.count, h.last, h.sum, np.array(h.samples)) for s, h in _histograms.items()}
+    rows = []
+    for stage, (count, last, total, samples) in sorted(snapshot.items()):
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99]) * 1000
+        rows.append({"stage": stage, "count": count, "last_ms": round(last * 1000, 2),
+                     "p50_ms": round(p50, 2), "p95_ms": round(p95, 2), "p99_ms": round(p99, 2),
+                     "total_s": round(total, 3)})
+    return pd.DataFrame(rows, columns=["stage", "count", "last_ms", "p50_ms", "p95_ms", "p99_ms", "total_s"])
+
+
+def prometheus():
+    """Every stage histogram in the Prometheus text exposition format."""
+    lines = [f"# HELP {METRIC} Wall time of each stage of the app.",
+             f"# TYPE {METRIC} histogram"]
+    with _lock:
+        for stage, h in sorted(_histograms.items()):
+            for bound, count in zip(h.buckets, h.counts):
+                lines.append(f'{METRIC}_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'{METRIC}_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+            lines.append(f'{METRIC}_sum{{stage="{stage}"}} {h.sum:.6f}')
+            lines.append(f'{METRIC}_count{{stage="{stage}"}} {h.count}')
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+
+
+##################################Metrics endpoint#############################
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def serve(port, host="127.0.0.1"):
+    """Serve /metrics on a daemon thread; only the first call in a process starts it."""
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), MetricsHandler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+            logger.info("serving metrics on http://%s:%d/metrics", host, _server.server_address[1])
+        return _server
+
+
+def serve_from_env():
+    """Start the metrics endpoint if METRICS_PORT is set (METRICS_HOST defaults to 127.0.0.1)."""
+    port = os.environ.get("METRICS_PORT")
+    if not port:
+        return None
+    try:
+        return serve(int(port), os.environ.get("METRICS_HOST", "127.0.0.1"))
+    except OSError as exc:
+        logger.warning("metrics endpoint not started: %s", exc)
+        return None